@@ -6,9 +6,10 @@ __author__ = 'Micah Smith'
 __email__ = 'micahs@mit.edu'
 __version__ = '0.8.8'
 
-from jupyterlab.labapp import LabApp
+from typing import TYPE_CHECKING
 
-from .handlers import setup_handlers
+if TYPE_CHECKING:
+    from jupyterlab.labapp import LabApp
 
 EXTENSION_URL_PATH = 'assemble'
 
@@ -19,7 +20,7 @@ def _jupyter_server_extension_paths():
     }]
 
 
-def load_jupyter_server_extension(app: LabApp):
+def load_jupyter_server_extension(app: 'LabApp'):
     """Register the API handler
 
     Args:
@@ -27,11 +28,21 @@ def load_jupyter_server_extension(app: LabApp):
             Notebook application instance
     """
 
-    # initialize app instance
+    # imported here rather than at module level, so that worker processes that
+    # import the package to run its functions do not import the server too
+    from tornado.ioloop import IOLoop
+
     from .app import AssembleApp
+    from .handlers import setup_handlers, setup_save_hook
+
+    # initialize app instance
     AssembleApp.clear_instance()
-    AssembleApp.instance(config=app.config)
+    assemble_app = AssembleApp.instance(config=app.config)
+    if assemble_app.github_token:
+        assemble_app.start_fork_warmup()
+    IOLoop.current().spawn_callback(assemble_app.warm_oauth_gateway)
 
     setup_handlers(app.web_app, EXTENSION_URL_PATH)
+    setup_save_hook(app.contents_manager)
     app.log.info('Registered ballet-assemble extension at URL path /%s',
                  EXTENSION_URL_PATH)
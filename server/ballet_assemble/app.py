@@ -1,32 +1,45 @@
+import atexit
 import base64
+import json
 import logging
+import math
 import os
 import pathlib
 import tempfile
+import threading
+import time
 import traceback
 import uuid
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, field
 from os import getenv
 from textwrap import dedent
-from typing import List, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple, Union
 from urllib.parse import urljoin
 
-import ballet.templating
 import funcy as fy
-import git
-import requests
-from ballet.exc import ConfigurationError
-from ballet.project import Project
-from ballet.util import truthy
-from ballet.util.code import blacken_code, is_valid_python
-from ballet.util.git import set_config_variables
-from cookiecutter.utils import work_in
-from github import Github
 from notebook.notebookapp import NotebookApp
 from stacklog import stacklog as _stacklog
-from traitlets import Bool, Integer, Unicode, default, validate
+from traitlets import Bool, Enum, Float, Integer, Unicode, default, observe, validate
 from traitlets.config import SingletonConfigurable
 
+from .cache import ExpiringCache, LRUCache
+from .formatting import CodeFormatter
+from .jobs import BoundedExecutor, Job, JobRegistry, QueueFullError, track_stage
+from .metrics import MetricsRegistry
+from .slicing import SliceIndex
+from .submissions import SubmissionLog, hash_submission
+from .transport import HTTPTransport
+
+# ballet, git, github and cookiecutter are imported where they are first
+# needed, so that they are not loaded at every start of the notebook server
+if TYPE_CHECKING:
+    import git
+    from ballet.project import Project
+    from github import Github
+
+    from .mirror import RepoMirror
+    from .templating import FeatureTemplate
+
 TESTING_URL = 'http://some/testing/url'
 
 
@@ -38,11 +51,24 @@ class Response:
     tb: str = None
 
 
+@dataclass
+class BatchResponse:
+    result: bool
+    responses: List[Response] = field(default_factory=list)
+    message: str = None
+
+
 @dataclass
 class Request:
     codeContent: str
 
 
+@dataclass
+class BatchRequest:
+    codeContents: List[str]
+    combined: bool = False
+
+
 def stacklog(level, message):
     """Stacklog decorator that uses instance method's `.logger` at given level"""
     level = logging.getLevelName(level)
@@ -50,7 +76,8 @@ def stacklog(level, message):
     def decorator(func):
         @fy.wraps(func)
         def wrapped(self, *args, **kwargs):
-            with _stacklog(fy.partial(self.log.log, level), message):
+            with _stacklog(fy.partial(self.log.log, level), message), \
+                    track_stage(func.__name__), self.metrics.time_stage(func.__name__):
                 return func(self, *args, **kwargs)
         return wrapped
     return decorator
@@ -64,11 +91,10 @@ def make_feature_and_branch_name():
     return feature_name, branch_name
 
 
-def get_new_feature_path(changes: List[Tuple[str, str]]):
-    cwd = pathlib.Path.cwd()
+def get_new_feature_path(changes: List[Tuple[str, str]], root: pathlib.Path):
     for (name, kind) in changes:
         if kind == 'file' and '__init__' not in str(name):
-            relname = pathlib.Path(name).relative_to(cwd)
+            relname = pathlib.Path(name).relative_to(root)
             return relname
     return None
 
@@ -77,14 +103,31 @@ def make_random_state():
     return base64.urlsafe_b64encode(os.urandom(16)).decode()
 
 
+def is_missing_repo_error(e: Exception) -> bool:
+    """Whether the error says that a repo does not exist or cannot be accessed"""
+    from git import GitCommandError
+    from github import GithubException
+
+    if isinstance(e, GithubException):
+        return e.status in (403, 404)
+    if isinstance(e, GitCommandError):
+        stderr = str(e.stderr).lower()
+        return any(s in stderr for s in ('not found', 'permission', 'denied', 'does not exist'))
+    return False
+
+
+def make_failure_response(e: Exception) -> 'Response':
+    message = str(e)
+    tb = ''.join(traceback.format_tb(e.__traceback__))
+    return Response(result=False, message=message, tb=tb)
+
+
 @fy.decorator
 def handlefailures(call):
     try:
         return call()
     except Exception as e:
-        message = str(e)
-        tb = ''.join(traceback.format_tb(e.__traceback__))
-        return Response(result=False, message=message, tb=tb)
+        return make_failure_response(e)
 
 
 class AssembleApp(SingletonConfigurable):
@@ -99,6 +142,7 @@ class AssembleApp(SingletonConfigurable):
 
     @default('debug')
     def _default_debug(self):
+        from ballet.util import truthy
         _default = 'False'
         # fixme: truthy only works on strings as of ballet==0.6.11
         return truthy(getenv('ASSEMBLE_DEBUG', default=_default))
@@ -131,22 +175,335 @@ class AssembleApp(SingletonConfigurable):
         help='url to github-oauth-gateway server',
     )
 
+    github_api_url = Unicode(
+        'https://api.github.com',
+        config=True,
+        help='base url of the GitHub API',
+    )
+
+    git_remote_url_template = Unicode(
+        'https://{token}@github.com/{username}/{reponame}',
+        config=True,
+        help='url of the forked repo to clone and push to, with {token}, {username} and '
+             '{reponame} replaced by the github token, the github username and the project '
+             'repo name',
+    )
+
     access_token_timeout = Integer(
         60,
         config=True,
         help='timeout to receive access token from server via polling'
     )
 
+    cache_dir = Unicode(
+        config=True,
+        help='directory for persistent caches, such as local mirrors of the forked repo'
+    )
+
+    @default('cache_dir')
+    def _default_cache_dir(self):
+        base = getenv('XDG_CACHE_HOME', '~/.cache')
+        return str(pathlib.Path(base, 'ballet-assemble').expanduser())
+
+    @validate('cache_dir')
+    def _validate_cache_dir(self, proposal):
+        return str(pathlib.Path(proposal['value']).expanduser().resolve())
+
+    use_mirror = Bool(
+        True,
+        config=True,
+        help='clone from a persistent local mirror of the forked repo, which is updated with an '
+             'incremental fetch, instead of cloning the fork over the network on each submission'
+    )
+
+    mirror_cache_size = Integer(
+        5,
+        config=True,
+        help='maximum number of repo mirrors to keep in the cache dir, least recently used '
+             'mirrors are evicted first'
+    )
+
+    clone_depth = Integer(
+        0,
+        min=0,
+        config=True,
+        help='number of commits of history to fetch when cloning the forked repo from the '
+             'remote, or 0 for full history'
+    )
+
+    clone_filter = Unicode(
+        '',
+        config=True,
+        help='object filter for a partial clone of the forked repo from the remote, such as '
+             '"blob:none" to fetch file contents only as they are needed'
+    )
+
+    sparse_checkout = Bool(
+        False,
+        config=True,
+        help='check out only the contrib directory of the project (and files in its parent '
+             'directories) rather than the whole working tree'
+    )
+
+    submit_engine = Enum(
+        ['git', 'api'],
+        'git',
+        config=True,
+        help='how to create the feature branch on the fork: "git" clones the fork and pushes a '
+             'new commit, "api" renders the feature in memory and creates the commit directly '
+             'with the GitHub API, with no working copy'
+    )
+
+    max_finished_jobs = Integer(
+        100,
+        config=True,
+        help='number of finished submission jobs to retain so their status can be queried'
+    )
+
+    submit_workers = Integer(
+        2,
+        min=1,
+        config=True,
+        help='number of submissions that may run at the same time, off the server\'s event loop'
+    )
+
+    submit_queue_size = Integer(
+        8,
+        min=0,
+        config=True,
+        help='number of submissions that may wait for a free worker before new submissions are '
+             'rejected'
+    )
+
+    github_cache_ttl = Integer(
+        600,
+        config=True,
+        help='seconds to reuse the GitHub client and the authenticated user\'s identity before '
+             'looking them up again'
+    )
+
+    fork_ready_timeout = Integer(
+        60,
+        config=True,
+        help='seconds to wait for a new fork to become readable when pre-warming it after '
+             'authentication'
+    )
+
+    github_http_cache_size = Integer(
+        256,
+        min=0,
+        config=True,
+        help='number of GitHub API responses to keep for conditional requests, which do not '
+             'count against the rate limit when the response is unchanged, or 0 to disable'
+    )
+
+    auth_positive_ttl = Integer(
+        300,
+        config=True,
+        help='seconds to trust a successful check that the github token is valid before '
+             'checking again, so that revoked tokens are eventually noticed'
+    )
+
+    auth_negative_ttl = Integer(
+        10,
+        config=True,
+        help='seconds to remember a failed check that the github token is valid before '
+             'checking again'
+    )
+
+    http_pool_size = Integer(
+        10,
+        min=1,
+        config=True,
+        help='number of connections to keep alive per host for requests to GitHub and the '
+             'oauth gateway'
+    )
+
+    http_timeout = Float(
+        15.0,
+        config=True,
+        help='seconds to wait to connect to or receive a response from GitHub and the oauth '
+             'gateway'
+    )
+
+    http_max_clients = Integer(
+        10,
+        min=1,
+        config=True,
+        help='number of concurrent non-blocking requests to the oauth gateway'
+    )
+
+    format_workers = Integer(
+        1,
+        min=0,
+        config=True,
+        help='number of worker processes that validate and format submitted code, or 0 to '
+             'do so in the submitting thread'
+    )
+
+    format_timeout = Float(
+        10.0,
+        config=True,
+        help='seconds to allow for validating and formatting submitted code'
+    )
+
+    format_cache_size = Integer(
+        256,
+        min=1,
+        config=True,
+        help='number of validated and formatted code contents to cache'
+    )
+
+    duplicate_submission_window = Integer(
+        24 * 60 * 60,
+        min=0,
+        config=True,
+        help='seconds for which submitting the same code again returns the pull request of '
+             'the earlier submission, or 0 to always create a new pull request'
+    )
+
+    duplicate_submission_wait = Float(
+        300.0,
+        min=0.0,
+        config=True,
+        help='seconds to wait for an identical submission that is in progress to open its pull '
+             'request before failing'
+    )
+
+    search_open_pull_requests = Bool(
+        False,
+        config=True,
+        help='whether to also search the open pull requests of the user for an identical '
+             'submission before creating a new one'
+    )
+
     # -- end traits --
 
+    @observe('github_token')
+    def _observe_github_token(self, change):
+        self._github_cache.clear()
+        self._auth_cache.clear()
+        for listener in list(self._auth_listeners):
+            listener()
+
+    @fy.cached_property
+    def _auth_listeners(self) -> set:
+        return set()
+
+    def add_auth_listener(self, listener: Callable[[], None]) -> None:
+        """Call listener, from any thread, whenever the github token changes"""
+        self._auth_listeners.add(listener)
+
+    def remove_auth_listener(self, listener: Callable[[], None]) -> None:
+        self._auth_listeners.discard(listener)
+
+    @property
+    def client_id_cache_path(self) -> pathlib.Path:
+        return pathlib.Path(self.cache_dir, 'oauth_client_ids.json')
+
+    @fy.cached_property
+    def metrics(self) -> MetricsRegistry:
+        """durations and outcomes of pipeline stages and requests"""
+        return MetricsRegistry()
+
+    @fy.cached_property
+    def formatter(self) -> CodeFormatter:
+        """cached validation and formatting of code contents"""
+        return CodeFormatter(self.format_workers, self.format_timeout, self.format_cache_size)
+
+    @fy.cached_property
+    def feature_template(self) -> 'FeatureTemplate':
+        """feature template of the installed version of ballet, compiled once"""
+        from .templating import FeatureTemplate
+        return FeatureTemplate()
+
     @fy.cached_property
+    def slice_index(self) -> SliceIndex:
+        """def-use index of the notebooks that were saved or sliced"""
+        index = SliceIndex(pathlib.Path(self.cache_dir, 'slice_index.json'))
+        # changes are written after a delay by a daemon thread, which does not
+        # outlive the server, so write any that are pending at exit
+        atexit.register(index.flush)
+        return index
+
+    _submission_logs = None
+
+    @property
+    def submission_log(self) -> SubmissionLog:
+        """pull requests opened for recent submissions of the current user"""
+        if self._submission_logs is None:
+            self._submission_logs = {}
+        username = self.username
+        if username not in self._submission_logs:
+            path = pathlib.Path(self.cache_dir, 'submissions', f'{username}.json')
+            self._submission_logs.setdefault(
+                username, SubmissionLog(path, self.duplicate_submission_window))
+        return self._submission_logs[username]
+
+    _client_ids = None
+
+    @property
+    def cached_client_id(self) -> Optional[str]:
+        """client id of the oauth gateway app from memory or disk, if known"""
+        if self._client_ids is None:
+            self._client_ids = {}
+            with fy.suppress(OSError, ValueError):
+                with self.client_id_cache_path.open() as f:
+                    self._client_ids.update(json.load(f))
+        return self._client_ids.get(self.oauth_gateway_url)
+
+    def _store_client_id(self, client_id: str) -> None:
+        _ = self.cached_client_id
+        self._client_ids[self.oauth_gateway_url] = client_id
+        path = self.client_id_cache_path
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with tmp_path.open('w') as f:
+                json.dump(self._client_ids, f)
+            os.replace(str(tmp_path), str(path))
+        except OSError:
+            self.log.warning('Could not save oauth client id to %s', path, exc_info=True)
+
+    @property
     def client_id(self):
-        base = self.oauth_gateway_url
-        url = urljoin(base, '/api/v1/app_id')
-        response = requests.get(url)
-        response.raise_for_status()
-        d = response.json()
-        return d['client_id']
+        client_id = self.cached_client_id
+        if client_id is None:
+            base = self.oauth_gateway_url
+            url = urljoin(base, '/api/v1/app_id')
+            response = self.transport.get(url)
+            response.raise_for_status()
+            d = response.json()
+            client_id = d['client_id']
+            self._store_client_id(client_id)
+        return client_id
+
+    async def fetch_client_id(self) -> str:
+        """Fetch the client id from the oauth gateway without blocking and save it"""
+        url = urljoin(self.oauth_gateway_url, '/api/v1/app_id')
+        response = await self.transport.fetch(url)
+        client_id = json.loads(response.body)['client_id']
+        self._store_client_id(client_id)
+        return client_id
+
+    async def wake_oauth_gateway(self) -> None:
+        """Request the oauth gateway's status, waking it up if it is sleeping"""
+        url = urljoin(self.oauth_gateway_url, '/status')
+        try:
+            await self.transport.fetch(url, raise_error=False)
+        except Exception as e:
+            self.log.info('Could not reach oauth gateway: %s', e)
+
+    async def warm_oauth_gateway(self) -> None:
+        """Wake up the oauth gateway and fetch the client id if it is not yet known"""
+        if self.cached_client_id is not None:
+            await self.wake_oauth_gateway()
+            return
+
+        try:
+            await self.fetch_client_id()
+        except Exception as e:
+            self.log.info('Could not fetch client id from oauth gateway: %s', e)
 
     scopes = ['read:user', 'public_repo']
     _state = None
@@ -160,27 +517,81 @@ class AssembleApp(SingletonConfigurable):
 
     def reset_state(self):
         self._state = None
+        self._auth_cache.clear()
 
     def set_github_token(self, token):
         self.github_token = token
 
-    _is_authenticated = False
+    @fy.cached_property
+    def _auth_cache(self) -> ExpiringCache:
+        return ExpiringCache(self.auth_positive_ttl)
+
+    def is_authenticated(self, refresh: bool = False) -> bool:
+        """Whether the github token is valid
+
+        The result is cached for auth_positive_ttl seconds if the token is
+        valid and auth_negative_ttl seconds if not. Pass refresh to check
+        with GitHub again regardless, such as after a request was rejected
+        because the token was revoked.
+        """
+        token = self.github_token
+        if not token:
+            return False
+
+        key = ('authenticated', token)
+        if refresh:
+            self._auth_cache.pop(key)
+
+        result = self._auth_cache.get(key)
+        if result is None:
+            result = self._check_authenticated()
+            ttl = self.auth_positive_ttl if result else self.auth_negative_ttl
+            self._auth_cache.set(key, result, ttl=ttl)
+        return result
+
+    def _check_authenticated(self) -> bool:
+        token = self.github_token
+        try:
+            # bypass the cached identity so a revoked token is detected
+            login = self.github.get_user().login
+        except Exception:
+            return False
+        self._github_cache.set(('username', token), login)
+        return True
+
+    @fy.cached_property
+    def _github_cache(self) -> ExpiringCache:
+        return ExpiringCache(self.github_cache_ttl)
+
+    @fy.cached_property
+    def _github_http_cache(self) -> LRUCache:
+        return LRUCache(self.github_http_cache_size)
 
-    def is_authenticated(self):
-        if not self._is_authenticated:
-            with fy.suppress(Exception):
-                _ = self.username
-                self._is_authenticated = True
+    @fy.cached_property
+    def transport(self) -> HTTPTransport:
+        """pooled http clients for all outbound requests"""
+        return HTTPTransport(self.http_pool_size, self.http_timeout, self.http_max_clients)
+
+    def make_github(self, token: str) -> 'Github':
+        from github import Github
 
-        return self._is_authenticated
+        from .http_cache import configure_connection
+        # PyGithub only accepts a whole number of seconds
+        github = Github(token, base_url=self.github_api_url,
+                        timeout=math.ceil(self.http_timeout))
+        store = self._github_http_cache if self.github_http_cache_size else None
+        return configure_connection(github, session=self.transport.session, store=store)
 
     @property
     def github(self):
-        return Github(self.github_token)
+        token = self.github_token
+        return self._github_cache.get_or_set(('github', token), lambda: self.make_github(token))
 
     @property
     def username(self):
-        return self.github.get_user().login
+        token = self.github_token
+        return self._github_cache.get_or_set(('username', token),
+                                             lambda: self.github.get_user().login)
 
     @property
     def useremail(self):
@@ -205,46 +616,380 @@ class AssembleApp(SingletonConfigurable):
     @property
     def repo_url(self):
         """url of forked repo, including token-based authentication"""
-        return f'https://{self.github_token}@github.com/{self.username}/{self.reponame}'
+        return self.git_remote_url_template.format(
+            token=self.github_token, username=self.username, reponame=self.reponame)
+
+    @property
+    def mirror_root(self) -> pathlib.Path:
+        return pathlib.Path(self.cache_dir, 'mirrors')
+
+    @property
+    def mirror(self) -> 'RepoMirror':
+        """local mirror of forked repo"""
+        from .mirror import RepoMirror
+        return RepoMirror(self.mirror_root.joinpath(self.username, f'{self.reponame}.git'))
+
+    @property
+    def clone_options(self) -> dict:
+        """options for git clone according to the configured clone strategy"""
+        options = {}
+        if self.clone_depth:
+            options['depth'] = self.clone_depth
+        if self.clone_filter:
+            options['filter'] = self.clone_filter
+        if self.sparse_checkout:
+            options['no_checkout'] = True
+        return options
 
     @property
     def project(self):
+        from ballet.exc import ConfigurationError
+
         # 1. configuration option passed explicitly
         # 2. from notebooks dir
         # 3. from cwd
         if self.ballet_yml_path:
-            return Project.from_path(self.ballet_yml_path)
+            return self.load_project(self.ballet_yml_path)
 
         path = NotebookApp.instance().notebook_dir
         with fy.suppress(Exception):
-            return Project.from_path(path)
+            return self.load_project(path)
 
         with fy.suppress(Exception):
-            return Project.from_cwd()
+            return self.load_project(pathlib.Path.cwd(), ascend=True)
 
         raise ConfigurationError('Could not detect Ballet project')
 
+    _projects = None
+    _projects_lock = threading.Lock()
+
+    def load_project(self, path, ascend: bool = False) -> 'Project':
+        """Load the project at path, reusing the last result until its ballet.yml changes"""
+        from ballet.project import DEFAULT_CONFIG_NAME, Project
+
+        key = (str(path), ascend)
+        with self._projects_lock:
+            if self._projects is None:
+                self._projects = {}
+
+            cached = self._projects.get(key)
+            if cached is not None:
+                project, config_path, mtime = cached
+                with fy.suppress(OSError):
+                    if config_path.stat().st_mtime_ns == mtime:
+                        return project
+
+            project = Project.from_path(path, ascend=ascend)
+            config_path = project.path.joinpath(DEFAULT_CONFIG_NAME)
+            mtime = config_path.stat().st_mtime_ns
+            self._projects[key] = (project, config_path, mtime)
+            return project
+
+    _ready_forks = None
+    _fork_warmup_lock = threading.Lock()
+
+    @property
+    def fork_key(self) -> Tuple[str, str]:
+        return self.username, self.upstream_repo_spec
+
+    def is_fork_ready(self) -> bool:
+        return self._ready_forks is not None and self.fork_key in self._ready_forks
+
+    def forget_fork(self) -> None:
+        """Forget that the user's fork is ready, so that the next submission forks again"""
+        if self._ready_forks is not None:
+            self._ready_forks.discard(self.fork_key)
+
+    def start_fork_warmup(self) -> None:
+        """Pre-warm the user's fork in a background thread"""
+        thread = threading.Thread(target=self._warm_fork_quietly, name='assemble-fork-warmup',
+                                  daemon=True)
+        thread.start()
+
+    def _warm_fork_quietly(self) -> None:
+        if not self._fork_warmup_lock.acquire(blocking=False):
+            return
+        try:
+            self.warm_fork()
+        except Exception as e:
+            self.log.info('Could not pre-warm fork: %s', e)
+        finally:
+            self._fork_warmup_lock.release()
+
+    @stacklog('INFO', 'Pre-warming fork')
+    def warm_fork(self) -> None:
+        """Create the user's fork if needed and wait until its git objects can be read
+
+        Once the fork is ready, later submissions skip asking GitHub to fork
+        the upstream repo.
+        """
+        from github import GithubException, UnknownObjectException
+
+        if self.is_fork_ready():
+            return
+
+        key = self.fork_key
+        try:
+            fork = self.github.get_repo(f'{self.username}/{self.reponame}')
+        except UnknownObjectException:
+            if self.debug:
+                self.log.debug('Didn\'t actually fork repo due to debug')
+                return
+            fork = self.upstream_repo.create_fork()
+
+        deadline = time.monotonic() + self.fork_ready_timeout
+        delay = 1
+        while True:
+            try:
+                fork.get_branch(fork.default_branch)
+                break
+            except GithubException:
+                if time.monotonic() + delay > deadline:
+                    raise TimeoutError('Timed out waiting for fork to become ready')
+                time.sleep(delay)
+                delay = min(2 * delay, 10)
+
+        if self._ready_forks is None:
+            self._ready_forks = set()
+        self._ready_forks.add(key)
+
+    @fy.cached_property
+    def jobs(self) -> JobRegistry:
+        return JobRegistry(self.max_finished_jobs)
+
+    @fy.cached_property
+    def executor(self) -> BoundedExecutor:
+        return BoundedExecutor(self.submit_workers, self.submit_queue_size,
+                               thread_name_prefix='assemble-submit')
+
+    def submit(self, input_data: dict) -> Job:
+        """Start a job in the background that creates a pull request for the code content
+
+        Raises:
+            QueueFullError: too many submissions are already running or queued
+        """
+        return self._start_job(self.create_pull_request_for_code_content, input_data)
+
+    def submit_batch(self, input_data: dict) -> Job:
+        """Start a job in the background that creates pull requests for several code contents
+
+        Raises:
+            QueueFullError: too many submissions are already running or queued
+        """
+        return self._start_job(self.create_pull_requests_for_code_contents, input_data)
+
+    def _start_job(self, func: Callable[[dict], dict], input_data: dict) -> Job:
+        job = self.jobs.create()
+        try:
+            self.executor.submit(self.jobs.run, job, func, input_data)
+        except QueueFullError:
+            self.jobs.discard(job)
+            raise
+        return job
+
     @fy.post_processing(asdict)
     @handlefailures
     def create_pull_request_for_code_content(self, input_data: dict) -> Response:
         code_content = self.load_request(input_data)
         self.check_code_is_valid(code_content)
+        return self.submit_features([code_content])[0]
+
+    @fy.post_processing(asdict)
+    def create_pull_requests_for_code_contents(self, input_data: dict) -> BatchResponse:
+        """Create pull requests for several code contents at the cost of about one
+
+        Invalid code contents fail on their own; the rest share a single fork
+        check and clone, and either get one pull request each or, if
+        ``combined``, one pull request together.
+        """
+        try:
+            code_contents, combined = self.load_batch_request(input_data)
+        except TypeError as e:
+            return BatchResponse(result=False, message=str(e))
 
-        # async
-        self.fork_repo()
+        responses = [
+            handlefailures(self.check_code_is_valid)(code_content)
+            for code_content in code_contents
+        ]
+        valid = [i for i, response in enumerate(responses) if response is None]
+        if valid:
+            submitted = handlefailures(self.submit_features)(
+                [code_contents[i] for i in valid], combined=combined)
+            if isinstance(submitted, Response):
+                submitted = [submitted] * len(valid)
+            for i, response in zip(valid, submitted):
+                responses[i] = response
+
+        result = bool(responses) and all(response.result for response in responses)
+        return BatchResponse(result=result, responses=responses)
+
+    def submit_features(self, code_contents: Sequence[str],
+                        combined: bool = False) -> List[Response]:
+        """Propose new features with the given code contents
+
+        Code contents that were submitted recently, or that are being
+        submitted by another job, get the response of the earlier submission
+        rather than a new pull request. If the submission fails partway, code
+        contents whose pull requests were already opened keep their
+        responses and only the rest get the failure.
+
+        Returns:
+            one response per code content, in order; with ``combined``, all
+            code contents share the response of their single pull request
+        """
+        groups = [list(code_contents)] if combined else [[c] for c in code_contents]
+        keys = [self.hash_submission(group) for group in groups]
+        groups_by_key = dict(zip(keys, groups))
+
+        responses = {}
+        reserved = set()
+        urls = {}
+        try:
+            # reserve in a global order, so that jobs sharing several
+            # submissions never wait on each other's reservations
+            for key in sorted(groups_by_key):
+                url = self.reserve_submission(key)
+                if url is None:
+                    reserved.add(key)
+                else:
+                    responses[key] = Response(result=True, url=url,
+                                              message='This feature was already submitted')
+            new_keys = [key for key in groups_by_key if key in reserved]
+
+            if new_keys:
+                # async
+                self.fork_repo()
+
+                new_contents = [c for key in new_keys for c in groups_by_key[key]]
+                try:
+                    if self.submit_engine == 'api':
+                        branches = self.submit_features_with_api(new_contents, combined)
+                    else:
+                        branches = self.submit_features_with_git(new_contents, combined)
+                except Exception as e:
+                    # the fork may have been deleted or renamed since it was ready
+                    if is_missing_repo_error(e):
+                        self.forget_fork()
+                    raise
+
+                for key, (feature_names, branch_name) in zip(new_keys, branches):
+                    response = self.create_pull_request(feature_names, branch_name,
+                                                        submission_hash=key)
+                    if not self.debug:
+                        self.submission_log.add(key, response.url)
+                    urls[key] = response.url
+                    responses[key] = response
+        except Exception as e:
+            failure = make_failure_response(e)
+            for key in groups_by_key:
+                responses.setdefault(key, failure)
+        finally:
+            for key in reserved:
+                self.submission_log.release(key, urls.get(key))
+
+        return [responses[key] for key, group in zip(keys, groups) for _ in group]
+
+    def hash_submission(self, code_contents: Sequence[str]) -> str:
+        """Identify the submission by its formatted code, so that whitespace does not matter"""
+        return hash_submission(
+            self.upstream_repo_spec,
+            [self.formatter.blacken(code_content) for code_content in code_contents])
+
+    def reserve_submission(self, key: str) -> Optional[str]:
+        """Reserve the submission, unless an identical one was or is being submitted
+
+        Waits for an identical submission that is in progress to open its pull
+        request, and takes over if it fails.
+
+        Returns:
+            the url of the pull request for the identical submission, or None
+            if the submission was reserved and must be released
+
+        Raises:
+            TimeoutError: the identical submission took longer than
+                ``duplicate_submission_wait``
+        """
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+
+        while True:
+            pending = self.submission_log.reserve(key)
+            if pending is None:
+                break
+            try:
+                url = pending.result(timeout=self.duplicate_submission_wait)
+            except FutureTimeoutError:
+                raise TimeoutError(
+                    'Timed out waiting for an identical submission in progress') from None
+            if url is not None:
+                return url
 
+        try:
+            url = self.find_submission(key)
+        except BaseException:
+            self.submission_log.release(key, None)
+            raise
+        if url is not None:
+            self.submission_log.release(key, url)
+        return url
+
+    @stacklog('INFO', 'Checking for duplicate submission')
+    def find_submission(self, key: str) -> Optional[str]:
+        """Find the url of the pull request for an earlier identical submission, if any"""
+        from github import GithubException
+
+        url = self.submission_log.get(key)
+        if url is None and self.search_open_pull_requests:
+            query = (f'{key} repo:{self.upstream_repo_spec} is:pr is:open '
+                     f'author:{self.username}')
+            with fy.suppress(GithubException):
+                url = fy.first(issue.html_url for issue in self.github.search_issues(query))
+        return url
+
+    def submit_features_with_api(self, code_contents: Sequence[str],
+                                 combined: bool) -> List[Tuple[List[str], str]]:
+        branches = []
+        files = {}
+        for code_content in code_contents:
+            feature_name, branch_name = make_feature_and_branch_name()
+            if combined:
+                files.update(self.render_new_feature(feature_name, code_content))
+                if branches:
+                    branches[0][0].append(feature_name)
+                    continue
+            else:
+                files = self.render_new_feature(feature_name, code_content)
+                self.create_remote_branch(branch_name, files)
+            branches.append(([feature_name], branch_name))
+
+        if combined:
+            self.create_remote_branch(branches[0][1], files)
+        return branches
+
+    def submit_features_with_git(self, code_contents: Sequence[str],
+                                 combined: bool) -> List[Tuple[List[str], str]]:
+        branches = []
         with tempfile.TemporaryDirectory() as dirname:
             dirname = str(pathlib.Path(dirname).resolve())
             repo = self.clone_repo(dirname)
-            with work_in(dirname):
-                self.configure_repo(repo)
-                feature_name, branch_name = self.create_new_branch(repo)
-                changed_files, new_feature_path = self.start_new_feature(dirname, feature_name)
-                self.write_code_content(new_feature_path, code_content)
+            self.configure_repo(repo)
+            base = repo.active_branch
+            for code_content in code_contents:
+                if combined and branches:
+                    feature_name, _ = make_feature_and_branch_name()
+                    branches[0][0].append(feature_name)
+                else:
+                    base.checkout()
+                    feature_name, branch_name = self.create_new_branch(repo)
+                    branches.append(([feature_name], branch_name))
+                changed_files, new_feature_path = self.start_new_feature(
+                    dirname, feature_name)
+                self.write_code_content(
+                    pathlib.Path(dirname, new_feature_path), code_content)
                 self.commit_changes(repo, changed_files)
-                push_result = self.push_to_remote(repo, branch_name)  # noqa F841
-                # TODO if push failed, likely because fork does not yet exist, then try again
-                return self.create_pull_request(feature_name, branch_name)
+            push_result = self.push_to_remote(  # noqa F841
+                repo, *(branch_name for _, branch_name in branches))
+            # TODO if push failed, likely because fork does not yet exist, then try again
+        return branches
 
     @stacklog('DEBUG', 'Loading request')
     def load_request(self, input_data: dict) -> str:
@@ -254,12 +999,22 @@ class AssembleApp(SingletonConfigurable):
             raise TypeError(f'Bad request - {e}') from e
         return req.codeContent
 
+    @stacklog('DEBUG', 'Loading batch request')
+    def load_batch_request(self, input_data: dict) -> Tuple[List[str], bool]:
+        try:
+            req = BatchRequest(**input_data)
+        except TypeError as e:
+            raise TypeError(f'Bad request - {e}') from e
+        if not isinstance(req.codeContents, list):
+            raise TypeError('Bad request - codeContents must be a list')
+        return req.codeContents, bool(req.combined)
+
     @stacklog('INFO', 'Checking for valid code')
     def check_code_is_valid(self, code_content: str) -> None:
         if not code_content.strip():
             raise ValueError('No code was submitted -- did you select the correct cell?')
 
-        if not is_valid_python(code_content):
+        if not self.formatter.is_valid(code_content):
             raise ValueError('Submitted code is not valid Python code')
 
     @stacklog('INFO', 'Forking upstream repo')
@@ -268,18 +1023,46 @@ class AssembleApp(SingletonConfigurable):
         # From https://docs.github.com/en/rest/reference/repos#create-a-fork:
         # > Note: Forking a Repository happens asynchronously. You may have to
         # > wait a short period of time before you can access the git objects.
-        if not self.debug:
+        if self.is_fork_ready():
+            self.log.debug('Fork is already ready')
+            return None
+        elif not self.debug:
             return self.upstream_repo.create_fork()
         else:
             self.log.debug('Didn\'t actually fork repo due to debug')
             return None
 
     @stacklog('INFO', 'Cloning repo')
-    def clone_repo(self, dirname: str) -> git.Repo:
-        return git.Repo.clone_from(self.repo_url, to_path=dirname)
+    def clone_repo(self, dirname: str) -> 'git.Repo':
+        import git
+
+        from .mirror import evict_mirrors
+
+        repo = None
+        if self.use_mirror:
+            # history is already local, so only the checkout strategy applies
+            try:
+                repo = self.mirror.clone(self.repo_url, dirname,
+                                         no_checkout=self.sparse_checkout)
+            except git.GitError:
+                self.log.warning('Failed to clone from local mirror, cloning from remote instead',
+                                 exc_info=True)
+            finally:
+                evict_mirrors(self.mirror_root, self.mirror_cache_size)
+
+        if repo is None:
+            repo = git.Repo.clone_from(self.repo_url, to_path=dirname, **self.clone_options)
+
+        if self.sparse_checkout:
+            contrib_dir = self.project.config.get('contrib.module_path')
+            repo.git.sparse_checkout('set', '--cone', contrib_dir)
+            repo.git.checkout(repo.active_branch.name)
+
+        return repo
 
     @stacklog('INFO', 'Configuring repo')
-    def configure_repo(self, repo: git.Repo) -> None:
+    def configure_repo(self, repo: 'git.Repo') -> None:
+        from ballet.util.git import set_config_variables
         set_config_variables(repo, {
             'user.name': self.username,  # github username
             'user.email': self.useremail,
@@ -287,64 +1070,147 @@ class AssembleApp(SingletonConfigurable):
         repo.remote().set_url(self.repo_url)
 
     @stacklog('INFO', 'Creating new branch and checking it out')
-    def create_new_branch(self, repo: git.Repo) -> Tuple[str, str]:
+    def create_new_branch(self, repo: 'git.Repo') -> Tuple[str, str]:
         feature_name, branch_name = make_feature_and_branch_name()
         repo.create_head(branch_name)
         repo.heads[branch_name].checkout()
         return feature_name, branch_name
 
-    @stacklog('INFO', 'Starting new feature')
-    def start_new_feature(self, dirname: str, feature_name: str) -> Tuple[List[str], str]:
-        # start new feature
-        extra_context = {
+    def make_feature_context(self, feature_name: str) -> dict:
+        return {
             'username': self.username.replace('-', '_'),
             'featurename': feature_name,
         }
-        contrib_dir = self.project.config.get('contrib.module_path')
-        changes = ballet.templating.start_new_feature(
-            contrib_dir=contrib_dir,
-            branching=False,
-            no_input=True,
-            extra_context=extra_context
-        )
+
+    def render_feature_template(self, feature_name: str) -> Dict[str, str]:
+        """Render the feature template for the user and feature name
+
+        Returns:
+            mapping from path within the contrib dir to file contents
+        """
+        return self.feature_template.render(**self.make_feature_context(feature_name))
+
+    @stacklog('INFO', 'Starting new feature')
+    def start_new_feature(self, dirname: str, feature_name: str) -> Tuple[List[str], str]:
+        """Add the files of a new feature to the contrib dir of the working copy at dirname
+
+        Like `ballet.templating.start_new_feature`, but resolves paths against
+        dirname instead of the working directory. Files that already exist are
+        left as they are.
+
+        Returns:
+            paths of the new files and of the new feature module, relative to dirname
+        """
+        root = pathlib.Path(dirname)
+        contrib_dir = root.joinpath(self.project.config.get('contrib.module_path'))
+        changes = []
+        for relpath, content in self.render_feature_template(feature_name).items():
+            path = contrib_dir.joinpath(relpath)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # the content already has the line endings of the template
+                with open(path, 'w', newline='') as f:
+                    f.write(content)
+                changes.append((str(path), 'file'))
         changed_files = [
-            str(pathlib.Path(name).relative_to(dirname))
+            str(pathlib.Path(name).relative_to(root))
             for (name, kind) in changes
             if kind == 'file'
         ]
-        new_feature_path = get_new_feature_path(changes)
+        new_feature_path = get_new_feature_path(changes, root)
         return changed_files, new_feature_path
 
     @stacklog('INFO', 'Adding code content')
     def write_code_content(self, new_feature_path: str, code_content: str):
+        blackened_code_content = self.formatter.blacken(code_content)
         with open(new_feature_path, 'w') as f:
-            blackened_code_content = blacken_code(code_content)
             f.write(blackened_code_content)
 
     @stacklog('INFO', 'Committing new feature')
     def commit_changes(self, repo, changed_files):
-        repo.index.add(changed_files)
-        repo.index.commit('Add new feature')
+        # use the git cli, as GitPython changes the working directory to add files to the index
+        repo.git.add('--', *changed_files)
+        repo.git.commit('--no-verify', '-m', 'Add new feature')
 
     @stacklog('INFO', 'Pushing to remote')
-    def push_to_remote(self, repo, branch_name) -> List[git.remote.PushInfo]:
-        refspec = f'refs/heads/{branch_name}:refs/heads/{branch_name}'
+    def push_to_remote(self, repo, *branch_names) -> List['git.remote.PushInfo']:
+        refspec = [
+            f'refs/heads/{branch_name}:refs/heads/{branch_name}'
+            for branch_name in branch_names
+        ]
         if not self.debug:
             return repo.remote().push(refspec=refspec)
         else:
             self.log.debug('Didn\'t actually push to remote due to debug')
 
+    @stacklog('INFO', 'Rendering new feature')
+    def render_new_feature(self, feature_name: str, code_content: str) -> Dict[str, str]:
+        """Render the feature template with the code content, without a working copy
+
+        Returns:
+            mapping from path within the repo to file contents
+        """
+        contrib_dir = pathlib.PurePosixPath(self.project.config.get('contrib.module_path'))
+        files = {}
+        for relpath, content in self.render_feature_template(feature_name).items():
+            if '__init__' in relpath:
+                files[str(contrib_dir.joinpath(relpath))] = content
+            else:
+                files[str(contrib_dir.joinpath(relpath))] = self.formatter.blacken(code_content)
+        return files
+
+    @stacklog('INFO', 'Creating new branch on remote')
+    def create_remote_branch(self, branch_name: str, files: Dict[str, str]) -> None:
+        """Commit files on top of the fork's default branch using the GitHub API
+
+        Files that already exist on the fork are left as they are, like
+        `ballet.templating.start_new_feature` does for a working copy.
+        """
+        from github import InputGitAuthor, InputGitTreeElement, UnknownObjectException
+
+        fork = self.github.get_repo(f'{self.username}/{self.reponame}')
+        base = fork.get_branch(fork.default_branch).commit.commit
+
+        existing = set()
+        for dirpath in {str(pathlib.PurePosixPath(path).parent) for path in files}:
+            with fy.suppress(UnknownObjectException):
+                existing.update(c.path for c in fork.get_contents(dirpath, ref=base.sha))
+
+        tree = [
+            InputGitTreeElement(path, '100644', 'blob', content=content)
+            for path, content in files.items()
+            if path not in existing
+        ]
+        author = InputGitAuthor(self.username, self.useremail)
+
+        if not self.debug:
+            new_tree = fork.create_git_tree(tree, base_tree=base.tree)
+            commit = fork.create_git_commit('Add new feature', new_tree, [base],
+                                            author=author, committer=author)
+            fork.create_git_ref(f'refs/heads/{branch_name}', commit.sha)
+        else:
+            self.log.debug('Didn\'t actually create branch on remote due to debug')
+
     @stacklog('INFO', 'Creating pull request')
-    def create_pull_request(self, feature_name, branch_name):
+    def create_pull_request(self, feature_name: Union[str, Sequence[str]], branch_name: str,
+                            submission_hash: Optional[str] = None):
         grepo = self.github.get_repo(self.upstream_repo_spec)
-        title = 'Propose new feature'
+        feature_names = [feature_name] if isinstance(feature_name, str) else list(feature_name)
+        if len(feature_names) == 1:
+            title = 'Propose new feature'
+            proposal = f'Propose new feature: {feature_names[0]}'
+        else:
+            title = 'Propose new features'
+            proposal = f'Propose new features: {", ".join(feature_names)}'
         body = dedent(f'''\
-                Propose new feature: {feature_name}
+                {proposal}
                 Submitted by user: {self.username}
 
                 --
                 Pull request automatically created by ballet-assemble
             ''')
+        if submission_hash is not None:
+            body += f'Submission: {submission_hash}\n'
         base = 'master'
         head = f'{self.username}:{branch_name}'
         maintainer_can_modify = True
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_missing = object()
+
+
+class ExpiringCache:
+    """Thread-safe mapping whose entries expire some time after they are set
+
+    Args:
+        ttl: default number of seconds that an entry is valid for
+        clock: function returning the current time in seconds
+    """
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._data = {}
+        self._lock = threading.RLock()
+        self._pending = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value, expires = self._data.get(key, (_missing, None))
+            if value is _missing:
+                return default
+            if expires <= self.clock():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            self._data[key] = (value, self.clock() + ttl)
+
+    def get_or_set(self, key: Hashable, func: Callable[[], Any],
+                   ttl: Optional[float] = None) -> Any:
+        """Get the value for key, computing and caching it with func if needed
+
+        Concurrent callers for the same key wait for a single call of func
+        rather than each calling it, while other keys remain available. Exceptions
+        raised by func are not cached.
+        """
+        with self._lock:
+            value = self.get(key, _missing)
+            if value is not _missing:
+                return value
+            key_lock = self._pending.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # another caller may have set the value while we waited
+            value = self.get(key, _missing)
+            if value is not _missing:
+                return value
+            try:
+                value = func()
+                self.set(key, value, ttl=ttl)
+            finally:
+                with self._lock:
+                    if self._pending.get(key) is key_lock:
+                        del self._pending[key]
+            return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value, _ = self._data.pop(key, (default, None))
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class LRUCache:
+    """Thread-safe mapping holding at most maxsize entries, evicting the least recently used
+
+    Args:
+        maxsize: maximum number of entries
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,157 @@
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Tuple
+
+from .cache import LRUCache
+
+
+def check_and_format(code: str) -> Tuple[bool, Optional[str]]:
+    """Check whether the code is valid Python and, if so, format it with black
+
+    Returns:
+        whether the code is valid, and the formatted code or None if invalid
+    """
+    # imported on first use, in the worker processes, as ballet is slow to import
+    from ballet.util.code import blacken_code, is_valid_python
+
+    if not is_valid_python(code):
+        return False, None
+    return True, blacken_code(code)
+
+
+def _start_worker() -> None:
+    # import the formatter ahead of the first call, which is then timed
+    # without the start-up of the worker
+    import ballet.util.code  # noqa F401
+
+
+class _Worker:
+    """A worker process that runs one call at a time"""
+
+    def __init__(self):
+        self._executor = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            self._executor.submit(_start_worker).result()
+        except BaseException:
+            self.terminate()
+            raise
+
+    def run(self, func: Callable, code: str, timeout: float):
+        return self._executor.submit(func, code).result(timeout=timeout)
+
+    def terminate(self) -> None:
+        # a running call cannot be cancelled, so the process has to be stopped
+        processes = getattr(self._executor, '_processes', None) or {}
+        for process in list(processes.values()):
+            process.terminate()
+        self._executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+class CodeFormatter:
+    """Validate and format code in worker processes, caching the results by content
+
+    Formatting runs in processes started with the spawn method, so that black
+    neither holds the GIL of the server nor takes it down if it crashes. Each
+    call has a worker to itself, and the timeout only starts once the worker
+    is ready: a call that takes longer is abandoned and only its worker is
+    replaced, while calls waiting for a worker are not affected. Workers are
+    started on first use.
+
+    Args:
+        max_workers: number of worker processes, or 0 to work in the calling
+            thread without a timeout
+        timeout: seconds to wait for the result of a single call, once it runs
+        cache_size: number of results to cache
+        func: function computing the validity and formatted code
+    """
+
+    def __init__(self, max_workers: int, timeout: float, cache_size: int,
+                 func: Callable[[str], Tuple[bool, Optional[str]]] = check_and_format):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.func = func
+        self._cache = LRUCache(cache_size)
+        self._idle: List[_Worker] = []
+        self._n_workers = 0
+        self._condition = threading.Condition()
+
+    def is_valid(self, code: str) -> bool:
+        valid, _ = self._get(code)
+        return valid
+
+    def blacken(self, code: str) -> str:
+        """Format the code with black
+
+        Raises:
+            ValueError: the code is not valid Python
+            TimeoutError: formatting took longer than the timeout
+        """
+        valid, formatted = self._get(code)
+        if not valid:
+            raise ValueError('Submitted code is not valid Python code')
+        return formatted
+
+    def _get(self, code: str) -> Tuple[bool, Optional[str]]:
+        key = hashlib.sha256(code.encode()).hexdigest()
+        result = self._cache.get(key)
+        if result is None:
+            result = self._run(code)
+            self._cache.set(key, result)
+        return result
+
+    def _run(self, code: str) -> Tuple[bool, Optional[str]]:
+        if not self.max_workers:
+            return self.func(code)
+
+        worker = self._acquire()
+        healthy = True
+        try:
+            return worker.run(self.func, code, self.timeout)
+        except FutureTimeoutError:
+            healthy = False
+            raise TimeoutError(
+                f'Formatting the code took longer than {self.timeout} seconds') from None
+        except BrokenProcessPool:
+            healthy = False
+            raise RuntimeError('Formatting the code crashed the formatter') from None
+        finally:
+            self._release(worker, healthy)
+
+    def _acquire(self) -> _Worker:
+        with self._condition:
+            while not self._idle and self._n_workers >= self.max_workers:
+                self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._n_workers += 1
+
+        try:
+            return _Worker()
+        except BaseException:
+            self._release(None, False)
+            raise
+
+    def _release(self, worker: Optional[_Worker], healthy: bool) -> None:
+        with self._condition:
+            if healthy:
+                self._idle.append(worker)
+            else:
+                self._n_workers -= 1
+            self._condition.notify()
+        if worker is not None and not healthy:
+            worker.terminate()
+
+    def shutdown(self) -> None:
+        with self._condition:
+            workers, self._idle = self._idle, []
+            self._n_workers -= len(workers)
+        for worker in workers:
+            worker.shutdown()
@@ -1,17 +1,22 @@
+import asyncio
+import datetime
+import inspect
+import json
 from functools import partial
 from urllib.parse import urlencode, urljoin
 
-import requests
 import tornado
 from notebook.base.handlers import APIHandler, IPythonHandler
 from notebook.notebookapp import NotebookWebApplication
 from notebook.utils import url_path_join
 from tenacity import (
-    RetryError, retry, retry_if_exception_message, retry_if_exception_type, stop_after_delay,
-    wait_fixed)
-from tornado.httpclient import AsyncHTTPClient
+    AsyncRetrying, RetryError, retry_if_exception_message, retry_if_exception_type,
+    stop_after_delay, wait_exponential)
+from tornado.ioloop import IOLoop
+from tornado.locks import Event
 
 from .app import AssembleApp
+from .jobs import QueueFullError
 
 try:
     from importlib import metadata
@@ -20,16 +25,38 @@ except ImportError:
 
 
 GITHUB_OAUTH_URL = 'https://github.com/login/oauth/authorize'
+MAX_AUTH_WAIT = 60
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'off'}
 
 
-class StatusHandler(APIHandler):
+class MetricsMixin:
+    """Record the outcome and duration of every request in the app's metrics"""
+
+    def on_finish(self):
+        super().on_finish()
+        AssembleApp.instance().metrics.record_request(
+            type(self).__name__, self.request.method, self.get_status(),
+            self.request.request_time())
+
+
+class MetricsHandler(MetricsMixin, IPythonHandler):
+
+    @tornado.web.authenticated
+    def get(self):
+        app = AssembleApp.instance()
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.finish(app.metrics.render())
+
+
+class StatusHandler(MetricsMixin, APIHandler):
 
     @tornado.web.authenticated
     def get(self):
         self.write({'status': 'OK'})
 
 
-class VersionHandler(APIHandler):
+class VersionHandler(MetricsMixin, APIHandler):
 
     @tornado.web.authenticated
     def get(self):
@@ -55,7 +82,7 @@ class VersionHandler(APIHandler):
         })
 
 
-class ConfigHandler(APIHandler):
+class ConfigHandler(MetricsMixin, APIHandler):
 
     @tornado.web.authenticated
     def get(self):
@@ -66,7 +93,7 @@ class ConfigHandler(APIHandler):
         self.write(result)
 
 
-class ConfigItemHandler(APIHandler):
+class ConfigItemHandler(MetricsMixin, APIHandler):
 
     @tornado.web.authenticated
     def get(self, attr):
@@ -78,31 +105,98 @@ class ConfigItemHandler(APIHandler):
             self.send_error(404)
 
 
-class SubmitHandler(APIHandler):
+class SubmitHandler(MetricsMixin, APIHandler):
 
     @tornado.web.authenticated
     def post(self):
         input_data = self.get_json_body()
         app = AssembleApp.instance()
-        result = app.create_pull_request_for_code_content(input_data)
-        self.write(result)
+        try:
+            job = app.submit(input_data)
+        except QueueFullError as e:
+            self.send_error(status_code=503, reason=str(e))
+            return
+        self.set_status(202)
+        self.write(job.to_dict())
 
 
-class AuthorizeHandler(IPythonHandler):
+class SubmitBatchHandler(MetricsMixin, APIHandler):
 
     @tornado.web.authenticated
-    def get(self):
+    def post(self):
+        input_data = self.get_json_body()
         app = AssembleApp.instance()
+        try:
+            job = app.submit_batch(input_data)
+        except QueueFullError as e:
+            self.send_error(status_code=503, reason=str(e))
+            return
+        self.set_status(202)
+        self.write(job.to_dict())
 
-        # wake server async
-        http_client = AsyncHTTPClient()
-        url = urljoin(app.oauth_gateway_url, '/status')
-        http_client.fetch(url)
+
+class SubmitStatusHandler(MetricsMixin, APIHandler):
+
+    @tornado.web.authenticated
+    def get(self, job_id):
+        app = AssembleApp.instance()
+        job = app.jobs.get(job_id)
+        if job is None:
+            self.send_error(404)
+        else:
+            self.write(job.to_dict())
+
+
+class SliceHandler(MetricsMixin, APIHandler):
+
+    @tornado.web.authenticated
+    async def post(self):
+        input_data = self.get_json_body() or {}
+        path = input_data.get('path')
+        cell_id = input_data.get('cellId')
+        cell_index = input_data.get('cellIndex')
+        if not path or (cell_id is None and cell_index is None):
+            self.send_error(status_code=400,
+                            reason='Bad request - path and cellId or cellIndex are required')
+            return
+
+        try:
+            model = self.contents_manager.get(path, content=True, type='notebook')
+            if inspect.isawaitable(model):
+                model = await model
+        except tornado.web.HTTPError as e:
+            self.send_error(status_code=e.status_code, reason=e.log_message)
+            return
+
+        app = AssembleApp.instance()
+        try:
+            code_content = await IOLoop.current().run_in_executor(None, partial(
+                app.slice_index.slice, model['path'], model['content'],
+                cell_id=cell_id, cell_index=cell_index))
+        except LookupError as e:
+            self.send_error(status_code=404, reason=str(e))
+            return
+
+        self.write({'codeContent': code_content})
+
+
+class AuthorizeHandler(MetricsMixin, IPythonHandler):
+
+    @tornado.web.authenticated
+    async def get(self):
+        app = AssembleApp.instance()
+
+        client_id = app.cached_client_id
+        if client_id is None:
+            client_id = await app.fetch_client_id()
+        else:
+            # wake server async
+            IOLoop.current().spawn_callback(app.wake_oauth_gateway)
 
         # do oauth flow
         base = GITHUB_OAUTH_URL
         params = {
-            'client_id': app.client_id,
+            'client_id': client_id,
             'state': app.state,
             'scope': ','.join(app.scopes),
         }
@@ -111,26 +205,45 @@ class AuthorizeHandler(IPythonHandler):
         self.redirect(url, permanent=False)
 
 
-class TokenHandler(IPythonHandler):
+class TokenHandler(MetricsMixin, IPythonHandler):
 
-    @retry(
-        wait=wait_fixed(3),
-        retry=(
-            retry_if_exception_type(RuntimeError) &
-            retry_if_exception_message(match=r'[Nn]o authorization code found.*')
-        ),
-        stop=stop_after_delay(AssembleApp.instance().access_token_timeout)
-    )
-    async def get_token(self, url, data):
-        response = requests.post(url, json=data)
-        d = response.json()
-        if response.ok:
+    _token_task = None
+
+    async def fetch_token(self, url, data):
+        app = AssembleApp.instance()
+        response = await app.transport.fetch(
+            url,
+            method='POST',
+            headers={'Content-Type': 'application/json'},
+            body=json.dumps(data),
+            raise_error=False,
+        )
+        d = json.loads(response.body) if response.body else {}
+        if 200 <= response.code < 300:
             # TODO also store other token info
             return d['access_token']
         else:
-            reason = d.get('message', '').lower()
+            reason = (d.get('message') or response.reason or '').lower()
             raise RuntimeError(reason)
 
+    async def get_token(self, url, data):
+        """Poll the gateway for the access token until the user completes the oauth flow"""
+        app = AssembleApp.instance()
+        retrying = AsyncRetrying(
+            wait=wait_exponential(multiplier=0.5, max=5),
+            retry=(
+                retry_if_exception_type(RuntimeError) &
+                retry_if_exception_message(match=r'[Nn]o authorization code found.*')
+            ),
+            stop=stop_after_delay(app.access_token_timeout),
+        )
+        return await retrying(self.fetch_token, url, data)
+
+    def on_connection_close(self):
+        # stop polling if the client goes away
+        if self._token_task is not None:
+            self._token_task.cancel()
+
     @tornado.web.authenticated
     async def post(self):
         """request token if we have just authenticated"""
@@ -140,10 +253,14 @@ class TokenHandler(IPythonHandler):
         url = urljoin(base, '/api/v1/access_token')
         data = {'state': state}
 
+        self._token_task = asyncio.ensure_future(self.get_token(url, data))
         try:
-            token = await self.get_token(url, data)
+            token = await self._token_task
             app.set_github_token(token)
+            app.start_fork_warmup()
             self.finish()
+        except asyncio.CancelledError:
+            self.log.info('Client disconnected while waiting for access token')
         except RetryError:
             self.send_error(status_code=400, reason='timeout')
         except RuntimeError as e:
@@ -152,15 +269,85 @@ class TokenHandler(IPythonHandler):
         app.reset_state()
 
 
-class AuthenticatedHandler(APIHandler):
+class AuthenticatedHandler(MetricsMixin, APIHandler):
+    """Report whether the user is authenticated with GitHub
+
+    With the query argument ``wait=<seconds>``, an unauthenticated request is
+    held open until the github token changes or the wait elapses, so that the
+    frontend learns about a completed login as soon as it happens. With
+    ``refresh=1``, the token is checked with GitHub rather than the cache.
+    """
+
+    _changed = None
+
+    def on_connection_close(self):
+        if self._changed is not None:
+            self._changed.set()
+
+    async def wait_for_change(self, timeout):
+        app = AssembleApp.instance()
+        loop = IOLoop.current()
+        self._changed = Event()
+
+        def listener():
+            loop.add_callback(self._changed.set)
+
+        app.add_auth_listener(listener)
+        try:
+            await self._changed.wait(timeout=datetime.timedelta(seconds=timeout))
+        except tornado.util.TimeoutError:
+            pass
+        finally:
+            app.remove_auth_listener(listener)
 
     @tornado.web.authenticated
-    def get(self):
+    async def get(self):
         app = AssembleApp.instance()
-        self.write({
-            'result': app.is_authenticated(),
-            'message': None,
-        })
+        try:
+            wait = float(self.get_query_argument('wait', '0'))
+        except ValueError:
+            self.send_error(status_code=400, reason='Bad request - wait must be a number')
+            return
+        refresh = self.get_query_argument('refresh', '').lower()
+        if refresh not in TRUE_VALUES | FALSE_VALUES:
+            self.send_error(status_code=400, reason='Bad request - refresh must be a boolean')
+            return
+
+        # checking with GitHub blocks, so do it off the event loop
+        loop = IOLoop.current()
+        result = await loop.run_in_executor(
+            None, partial(app.is_authenticated, refresh=refresh in TRUE_VALUES))
+        if not result and wait > 0:
+            await self.wait_for_change(min(wait, MAX_AUTH_WAIT))
+            result = await loop.run_in_executor(None, app.is_authenticated)
+
+        if not self.request.connection.stream.closed():
+            self.write({
+                'result': result,
+                'message': None,
+            })
+
+
+def setup_save_hook(contents_manager):
+    """Update the slice index whenever a notebook is saved, after any configured hook
+
+    The pre-save hook is used because, unlike the post-save hook, it receives
+    the content of the notebook and is supported by all contents managers.
+    """
+    previous_hook = contents_manager.pre_save_hook
+
+    def pre_save_hook(model, path, contents_manager, **kwargs):
+        if previous_hook is not None:
+            previous_hook(model=model, path=path, contents_manager=contents_manager, **kwargs)
+        if model.get('type') == 'notebook' and model.get('content') is not None:
+            app = AssembleApp.instance()
+            try:
+                app.slice_index.update(path.strip('/'), model['content'])
+            except Exception:
+                # indexing is an optimization and must never fail the save
+                app.log.warning('Failed to index notebook %s', path, exc_info=True)
+
+    contents_manager.pre_save_hook = pre_save_hook
 
 
 def setup_handlers(app: NotebookWebApplication, url_path: str):
@@ -171,9 +358,13 @@ def setup_handlers(app: NotebookWebApplication, url_path: str):
     app.add_handlers(host_pattern, [
         (route_pattern('status'), StatusHandler),
         (route_pattern('version'), VersionHandler),
+        (route_pattern('metrics'), MetricsHandler),
         (route_pattern('config'), ConfigHandler),
         (route_pattern(r'config/(.*)'), ConfigItemHandler),
         (route_pattern('submit'), SubmitHandler),
+        (route_pattern('submit', 'batch'), SubmitBatchHandler),
+        (route_pattern(r'submit/(\w+)'), SubmitStatusHandler),
+        (route_pattern('slice'), SliceHandler),
         (route_pattern('auth', 'authorize'), AuthorizeHandler),
         (route_pattern('auth', 'token'), TokenHandler),
         (route_pattern('auth', 'authenticated'), AuthenticatedHandler),
@@ -0,0 +1,135 @@
+import functools
+import hashlib
+from typing import Optional
+
+import requests
+from github import Github
+from github.Requester import HTTPSRequestsConnectionClass
+from requests.adapters import DEFAULT_POOLSIZE, DEFAULT_RETRIES, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .cache import LRUCache
+
+
+class CachedResponse:
+    """Response for PyGithub that mimics the httplib response object"""
+
+    def __init__(self, status: int, headers: CaseInsensitiveDict, text: str):
+        self.status = status
+        self.headers = headers
+        self.text = text
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self) -> str:
+        return self.text
+
+
+class ConditionalRequestsConnection(HTTPSRequestsConnectionClass):
+    """PyGithub connection that revalidates cached GET responses with conditional requests
+
+    The ETag and Last-Modified validators of each successful GET response are
+    stored, along with the response itself, keyed by URL and credentials.
+    Later GETs of the same URL send If-None-Match/If-Modified-Since, and a
+    304 Not Modified, which does not count against the GitHub rate limit, is
+    answered from the store.
+
+    Args:
+        session: requests session to send requests with, instead of a new one
+        store: cache of responses shared between connections, or None to
+            send every request unconditionally
+        protocol: 'http' or 'https'
+    """
+
+    def __init__(self, host, port=None, *args, session: Optional[requests.Session] = None,
+                 store: Optional[LRUCache] = None, protocol: str = 'https', **kwargs):
+        super().__init__(host, port, *args, **kwargs)
+        self.store = store
+        self.protocol = protocol
+        if not port and protocol == 'http':
+            self.port = 80
+        if session is not None:
+            self.session = session
+        else:
+            self.session.mount('http://', self.adapter)
+
+    @staticmethod
+    def _key(url: str, headers: dict):
+        authorization = headers.get('Authorization') or ''
+        credentials = hashlib.sha256(authorization.encode()).hexdigest()
+        return url, credentials
+
+    def getresponse(self):
+        if self.store is None or self.verb.upper() != 'GET':
+            return super().getresponse()
+
+        # the key and the headers sent are made from the same request, as
+        # captured here once
+        url, headers = self.url, dict(self.headers)
+        key = self._key(url, headers)
+        cached = self.store.get(key)
+        if cached is not None:
+            etag = cached.headers.get('ETag')
+            if etag:
+                headers['If-None-Match'] = etag
+            last_modified = cached.headers.get('Last-Modified')
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        self.url, self.headers = url, headers
+
+        response = super().getresponse()
+
+        if response.status == 304 and cached is not None:
+            # keep fresh rate limit headers while replaying the cached body
+            headers = CaseInsensitiveDict(cached.headers)
+            headers.update(response.headers)
+            return CachedResponse(cached.status, headers, cached.text)
+        elif response.status == 200 and (
+            'ETag' in response.headers or 'Last-Modified' in response.headers
+        ):
+            self.store.set(key, CachedResponse(
+                response.status, CaseInsensitiveDict(response.headers), response.text))
+
+        return response
+
+
+def _mount_retry_adapter(session: requests.Session, requester) -> None:
+    # each connection of PyGithub mounts an adapter with the retry policy of
+    # the client on a session of its own, so do the same on the shared
+    # session, for the API host only so that other traffic is unaffected
+    scheme = requester._Requester__scheme
+    port = requester._Requester__port or (80 if scheme == 'http' else 443)
+    prefix = f'{scheme}://{requester._Requester__hostname}:{port}/'
+    if prefix in session.adapters:
+        return
+    retry = requester._Requester__retry
+    pooled = session.adapters.get(f'{scheme}://')
+    session.mount(prefix, HTTPAdapter(
+        max_retries=DEFAULT_RETRIES if retry is None else retry,
+        pool_connections=getattr(pooled, '_pool_connections', DEFAULT_POOLSIZE),
+        pool_maxsize=getattr(pooled, '_pool_maxsize', DEFAULT_POOLSIZE)))
+
+
+def configure_connection(github: Github, session: Optional[requests.Session] = None,
+                         store: Optional[LRUCache] = None) -> Github:
+    """Make the GitHub client send requests with session and conditional requests with store
+
+    The client may then be shared between threads: each request gets a
+    connection object of its own, while the connections themselves are
+    pooled by the session. Requests to the GitHub API host are retried with
+    the client's retry policy, as they would be with a session of its own.
+    """
+    # PyGithub has no public hook to configure the connection of a single
+    # client, only the process-wide Requester.injectConnectionClasses
+    requester = github._Github__requester
+    if session is not None:
+        _mount_retry_adapter(session, requester)
+    # by default, the requester reuses a single connection object, which
+    # holds the verb, url and headers of the request between sending it and
+    # reading the response, so that concurrent requests can swap them
+    requester._Requester__persist = False
+    requester._Requester__connectionClass = functools.partial(
+        ConditionalRequestsConnection, session=session, store=store,
+        protocol=requester._Requester__scheme)
+    return github
@@ -0,0 +1,142 @@
+import contextlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+
+_current_job = ContextVar('current_job', default=None)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = PENDING
+    stage: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    response: Optional[dict] = None
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'timings': dict(self.timings),
+            'response': self.response,
+        }
+
+    @property
+    def done(self) -> bool:
+        return self.status == DONE
+
+
+@contextlib.contextmanager
+def track_stage(name: str):
+    """Record the time spent in a pipeline stage on the job running in this context, if any
+
+    Time spent in a stage that is entered several times is added up, and the
+    enclosing stage, if any, is current again once a nested stage exits.
+    """
+    job = _current_job.get()
+    if job is None:
+        yield
+        return
+
+    outer, job.stage = job.stage, name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        job.timings[name] = job.timings.get(name, 0.0) + time.perf_counter() - start
+        job.stage = outer
+
+
+class JobRegistry:
+    """Registry of submission jobs that retains a bounded number of finished jobs
+
+    Args:
+        max_finished: maximum number of finished jobs to keep, the oldest
+            finished jobs are forgotten first
+    """
+
+    def __init__(self, max_finished: int):
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self) -> Job:
+        job = Job(id=uuid.uuid4().hex)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job: Job) -> None:
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    def run(self, job: Job, func: Callable[..., dict], *args, **kwargs) -> dict:
+        """Run func as the given job, recording its stages and final response"""
+        token = _current_job.set(job)
+        job.status = RUNNING
+        try:
+            job.response = func(*args, **kwargs)
+        finally:
+            job.stage = None
+            job.status = DONE
+            _current_job.reset(token)
+            self._prune()
+        return job.response
+
+    def _prune(self) -> None:
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.done]
+            for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+                del self._jobs[job_id]
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded number of outstanding tasks
+
+    Tasks beyond the running workers wait in a queue of at most
+    ``max_queued`` tasks; submitting while the queue is full raises
+    QueueFullError rather than blocking the caller.
+
+    Args:
+        max_workers: number of worker threads
+        max_queued: number of tasks that may wait for a free worker
+        thread_name_prefix: prefix for names of worker threads
+    """
+
+    def __init__(self, max_workers: int, max_queued: int, thread_name_prefix: str = ''):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError('Too many submissions in progress, try again later')
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,120 @@
+import logging
+import os
+import pathlib
+import shutil
+import threading
+from collections import defaultdict
+from typing import List
+
+import git
+
+logger = logging.getLogger(__name__)
+
+_locks_lock = threading.Lock()
+_locks = defaultdict(threading.Lock)
+
+
+def _get_lock(path: pathlib.Path) -> threading.Lock:
+    with _locks_lock:
+        return _locks[str(path)]
+
+
+class RepoMirror:
+    """Bare mirror of a remote repo, kept on disk as a cheap local clone source
+
+    The mirror is created with a full clone the first time it is used and is
+    then brought up to date with an incremental fetch. Clones made from the
+    mirror are local clones, which hardlink the object store rather than
+    downloading anything. Credentials are passed on every fetch and are never
+    persisted in the mirror's config.
+
+    Args:
+        path: location of the bare repo on disk
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+
+    @property
+    def lock(self) -> threading.Lock:
+        return _get_lock(self.path)
+
+    def clone(self, url: str, dirname: str, **options) -> git.Repo:
+        """Update the mirror from url and then clone it into dirname
+
+        Additional options are passed through to ``git clone``.
+        """
+        with self.lock:
+            self.update(url)
+            try:
+                return git.Repo.clone_from(str(self.path), to_path=dirname, **options)
+            except git.GitCommandError:
+                logger.warning('Failed to clone from mirror at %s, recreating it', self.path)
+                shutil.rmtree(dirname, ignore_errors=True)
+                self.create(url)
+                return git.Repo.clone_from(str(self.path), to_path=dirname, **options)
+
+    def update(self, url: str) -> git.Repo:
+        """Fetch from url into the mirror, recreating it if it is missing or corrupt
+
+        Errors fetching from url, such as network errors, are raised rather
+        than treated as corruption of the mirror.
+        """
+        try:
+            repo = git.Repo(str(self.path))
+            repo.git.rev_parse('--verify', 'HEAD')
+        except (git.NoSuchPathError, git.InvalidGitRepositoryError):
+            repo = self.create(url)
+        except git.GitCommandError:
+            logger.warning('Mirror at %s is unusable, recreating it', self.path)
+            repo = self.create(url)
+        else:
+            repo.git.fetch(url, '+refs/heads/*:refs/heads/*', prune=True)
+        self.touch()
+        return repo
+
+    def create(self, url: str) -> git.Repo:
+        self.remove()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        repo = git.Repo.clone_from(url, to_path=str(self.path), bare=True)
+        repo.remote().set_url(str(self.path))
+        return repo
+
+    def remove(self) -> None:
+        if self.path.exists():
+            shutil.rmtree(str(self.path))
+
+    def touch(self) -> None:
+        os.utime(str(self.path))
+
+    @property
+    def last_used(self) -> float:
+        return self.path.stat().st_mtime
+
+
+def list_mirrors(root: pathlib.Path) -> List[RepoMirror]:
+    """List mirrors stored under root, laid out as root/<username>/<reponame>.git"""
+    root = pathlib.Path(root)
+    if not root.is_dir():
+        return []
+    return [RepoMirror(path) for path in root.glob('*/*.git') if path.is_dir()]
+
+
+def evict_mirrors(root: pathlib.Path, keep: int) -> List[RepoMirror]:
+    """Remove all but the `keep` most recently used mirrors under root
+
+    Mirrors that are currently in use by another submission are skipped.
+
+    Returns:
+        the mirrors that were removed
+    """
+    mirrors = sorted(list_mirrors(root), key=lambda m: m.last_used, reverse=True)
+    evicted = []
+    for mirror in mirrors[max(keep, 0):]:
+        if mirror.lock.acquire(blocking=False):
+            try:
+                mirror.remove()
+                evicted.append(mirror)
+            finally:
+                mirror.lock.release()
+    return evicted
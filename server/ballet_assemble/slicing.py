@@ -0,0 +1,470 @@
+import ast
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# lines that are IPython syntax rather than Python, e.g. %matplotlib or !pip
+MAGIC_REGEX = re.compile(r'^\s*[%!]')
+
+
+@dataclass(frozen=True)
+class Statement:
+    """A top-level statement of a cell with the names it reads and writes
+
+    Attributes:
+        source: source code of the statement
+        defs: names whose value the statement sets or modifies
+        kills: names that the statement rebinds entirely, so that earlier
+            definitions no longer matter
+        uses: names whose value the statement reads
+        opaque: whether the names are unknown because the source could not
+            be parsed, so that the statement may define anything
+    """
+    source: str
+    defs: FrozenSet[str]
+    kills: FrozenSet[str]
+    uses: FrozenSet[str]
+    opaque: bool = False
+
+
+class _NameCollector(ast.NodeVisitor):
+    """Collect names read and bound by a statement, ignoring names local to nested scopes"""
+
+    def __init__(self):
+        self.stores = set()
+        self.loads = set()
+        self._scopes = []
+
+    def _bind(self, name):
+        if self._scopes:
+            self._scopes[-1][0].add(name)
+        else:
+            self.stores.add(name)
+
+    def _load(self, name):
+        if self._scopes:
+            self._scopes[-1][1].add(name)
+        else:
+            self.loads.add(name)
+
+    def _visit_scope(self, args: Optional[ast.arguments], body):
+        self._scopes.append((set(), set()))
+        if args is not None:
+            for arg in args.posonlyargs if hasattr(args, 'posonlyargs') else []:
+                self._bind(arg.arg)
+            for arg in args.args + args.kwonlyargs:
+                self._bind(arg.arg)
+            for arg in (args.vararg, args.kwarg):
+                if arg is not None:
+                    self._bind(arg.arg)
+        for node in body:
+            self.visit(node)
+        local, loaded = self._scopes.pop()
+        for name in loaded - local:
+            self._load(name)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Store):
+            self._bind(node.id)
+        else:
+            self._load(node.id)
+
+    def visit_FunctionDef(self, node):
+        for expr in node.decorator_list + node.args.defaults + node.args.kw_defaults:
+            if expr is not None:
+                self.visit(expr)
+        self._bind(node.name)
+        self._visit_scope(node.args, node.body)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        for expr in node.args.defaults + node.args.kw_defaults:
+            if expr is not None:
+                self.visit(expr)
+        self._visit_scope(node.args, [node.body])
+
+    def visit_ClassDef(self, node):
+        for expr in node.decorator_list + node.bases + [k.value for k in node.keywords]:
+            self.visit(expr)
+        self._bind(node.name)
+        self._visit_scope(None, node.body)
+
+    def _visit_comprehension(self, node, elts):
+        self._scopes.append((set(), set()))
+        for generator in node.generators:
+            self.visit(generator)
+        for elt in elts:
+            self.visit(elt)
+        local, loaded = self._scopes.pop()
+        for name in loaded - local:
+            self._load(name)
+
+    def visit_ListComp(self, node):
+        self._visit_comprehension(node, [node.elt])
+
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._visit_comprehension(node, [node.key, node.value])
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._bind(alias.asname or alias.name.split('.')[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name != '*':
+                self._bind(alias.asname or alias.name)
+
+
+def _base_name(node: ast.AST) -> Optional[str]:
+    while isinstance(node, (ast.Attribute, ast.Subscript, ast.Call)):
+        node = node.func if isinstance(node, ast.Call) else node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _mutated_names(node: ast.stmt) -> FrozenSet[str]:
+    """Names modified in place, like ``df['x'] = ...`` or ``df.fillna(0, inplace=True)``"""
+    if isinstance(node, ast.Assign):
+        targets = node.targets
+    elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+        targets = [node.target]
+    elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call) \
+            and isinstance(node.value.func, ast.Attribute):
+        # the object of a method call, like lst in lst.append(1), is modified
+        # even though it is a plain name
+        name = _base_name(node.value.func.value)
+        return frozenset() if name is None else frozenset([name])
+    else:
+        return frozenset()
+
+    names = set()
+    for target in targets:
+        for elt in target.elts if isinstance(target, (ast.Tuple, ast.List)) else [target]:
+            if not isinstance(elt, ast.Name):
+                name = _base_name(elt)
+                if name is not None:
+                    names.add(name)
+    return frozenset(names)
+
+
+def _strip_magics(source: str) -> str:
+    return '\n'.join(
+        '' if MAGIC_REGEX.match(line) else line
+        for line in source.splitlines()
+    )
+
+
+def _group_lines(tree: ast.Module, n_lines: int) -> List[Tuple[int, int, List[ast.stmt]]]:
+    # top-level statements with their first and last lines, where statements
+    # that share a line, like x = 1; y = 2, are grouped together
+    starts = [
+        min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        for node in tree.body
+    ]
+    groups = []
+    for i, node in enumerate(tree.body):
+        end = getattr(node, 'end_lineno', None)
+        if end is None:
+            end = min([start - 1 for start in starts[i + 1:] if start > starts[i]],
+                      default=n_lines)
+        if groups and starts[i] <= groups[-1][1]:
+            first, last, nodes = groups[-1]
+            groups[-1] = (first, max(last, end), nodes + [node])
+        else:
+            groups.append((starts[i], end, [node]))
+    return groups
+
+
+def _analyze_statement(node: ast.stmt) -> Tuple[Set[str], Set[str], Set[str]]:
+    collector = _NameCollector()
+    collector.visit(node)
+    uses = set(collector.loads)
+    kills = set(collector.stores)
+    if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+        uses.add(node.target.id)
+        kills.discard(node.target.id)
+    mutated = _mutated_names(node)
+    return collector.stores | mutated, kills, uses | mutated
+
+
+def analyze_cell(source: str) -> List[Statement]:
+    """Split the source of a code cell into statements annotated with their names
+
+    Lines of IPython syntax are ignored. Statements that share a line form a
+    single statement. A cell that is still not valid Python is a single
+    opaque statement, as what it defines is unknown.
+    """
+    try:
+        tree = ast.parse(_strip_magics(source))
+    except SyntaxError:
+        if not source.strip():
+            return []
+        return [Statement(source.rstrip(), frozenset(), frozenset(), frozenset(), opaque=True)]
+
+    lines = source.splitlines()
+    statements = []
+    for first, last, nodes in _group_lines(tree, len(lines)):
+        source_lines = lines[first - 1:last]
+        while source_lines and not source_lines[-1].strip():
+            source_lines.pop()
+
+        defs, kills, uses = set(), set(), set()
+        for node in nodes:
+            node_defs, node_kills, node_uses = _analyze_statement(node)
+            # names bound by an earlier statement on the line are not needed before it
+            uses |= node_uses - kills
+            defs |= node_defs
+            kills |= node_kills
+        statements.append(Statement(
+            source='\n'.join(source_lines),
+            defs=frozenset(defs),
+            kills=frozenset(kills),
+            uses=frozenset(uses),
+        ))
+    return statements
+
+
+def slice_cells(cells: Sequence[List[Statement]], index: int) -> str:
+    """Compute the backward slice of the code cell at index
+
+    The slice consists of the statements of the cell itself and all
+    statements of earlier cells that they depend on, directly or
+    indirectly, in notebook order. Opaque statements of earlier cells are
+    always included, as they may define anything.
+
+    Args:
+        cells: analyzed statements of each code cell, in notebook order
+        index: position of the cell to slice within cells
+
+    Returns:
+        source code of the slice
+    """
+    needed = set()
+    included = []
+    for i in range(index, -1, -1):
+        for statement in reversed(cells[i]):
+            if i == index or statement.opaque or statement.defs & needed:
+                included.append(statement)
+                needed -= statement.kills
+                needed |= statement.uses
+    return '\n'.join(statement.source for statement in reversed(included))
+
+
+def find_code_cell(notebook: dict, cell_id: Optional[str] = None,
+                   cell_index: Optional[int] = None) -> Optional[int]:
+    """Find the position of a cell among the code cells of the notebook
+
+    The cell is identified by its id (nbformat 4.5+) or, failing that, by its
+    position among all cells of the notebook.
+    """
+    code_index = -1
+    for i, cell in enumerate(notebook.get('cells', [])):
+        is_code = cell.get('cell_type') == 'code'
+        if is_code:
+            code_index += 1
+        if (cell_id is not None and cell.get('id') == cell_id) \
+                or (cell_id is None and i == cell_index):
+            return code_index if is_code else None
+    return None
+
+
+def _code_cell_sources(notebook: dict) -> List[str]:
+    sources = [
+        cell.get('source', '')
+        for cell in notebook.get('cells', [])
+        if cell.get('cell_type') == 'code'
+    ]
+    return [''.join(source) if isinstance(source, list) else source for source in sources]
+
+
+def hash_source(source: str) -> str:
+    return hashlib.sha1(source.encode()).hexdigest()
+
+
+def slice_notebook(notebook: dict, cell_id: Optional[str] = None,
+                   cell_index: Optional[int] = None) -> str:
+    """Compute the backward slice of a code cell of the notebook
+
+    Raises:
+        LookupError: the notebook has no such code cell
+    """
+    index = find_code_cell(notebook, cell_id=cell_id, cell_index=cell_index)
+    if index is None:
+        raise LookupError('Code cell not found in notebook')
+    sources = _code_cell_sources(notebook)
+    cells = [analyze_cell(source) for source in sources[:index + 1]]
+    return slice_cells(cells, index)
+
+
+class SliceIndex:
+    """Def-use index of notebooks that is updated incrementally as cells change
+
+    Each distinct cell source is analyzed once and identified by its hash,
+    so updating the index for a saved notebook only parses the cells that
+    changed since the last update, and slicing looks up the analyses of the
+    cells rather than parsing the notebook.
+
+    Changes are persisted in a background thread once ``save_delay`` seconds
+    have passed since the first unsaved change, so that a burst of saves
+    writes the index once and the caller never waits for the write. Call
+    ``flush`` before exiting to write changes that are still pending.
+
+    Args:
+        path: file to persist the index to, or None to keep it in memory only
+        max_notebooks: number of notebooks to keep, the least recently
+            updated notebooks are forgotten first
+        save_delay: seconds to wait before persisting changes
+    """
+
+    version = 2
+
+    def __init__(self, path: Optional[pathlib.Path] = None, max_notebooks: int = 100,
+                 save_delay: float = 5.0):
+        self.path = path
+        self.max_notebooks = max_notebooks
+        self.save_delay = save_delay
+        self._cells: Dict[str, List[Statement]] = {}
+        self._notebooks: Dict[str, List[str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._load()
+
+    def update(self, key: str, notebook: dict) -> List[str]:
+        """Index the code cells of the notebook identified by key
+
+        Returns:
+            hashes of the code cells, in notebook order
+        """
+        hashes, _ = self._update(key, notebook)
+        return hashes
+
+    def _update(self, key: str, notebook: dict) -> Tuple[List[str], List[List[Statement]]]:
+        sources = _code_cell_sources(notebook)
+        hashes = [hash_source(source) for source in sources]
+        with self._lock:
+            missing = {
+                hash_: source
+                for hash_, source in zip(hashes, sources)
+                if hash_ not in self._cells
+            }
+        # parse without the lock, so that slicing other notebooks does not wait
+        analyzed = {hash_: analyze_cell(source) for hash_, source in missing.items()}
+        with self._lock:
+            for hash_, statements in analyzed.items():
+                self._cells.setdefault(hash_, statements)
+            changed = bool(analyzed) or self._notebooks.get(key) != hashes
+            self._notebooks[key] = hashes
+            self._notebooks.move_to_end(key)
+            if changed:
+                self._prune()
+                self._schedule_save()
+            return hashes, [self._cells[hash_] for hash_ in hashes]
+
+    def slice(self, key: str, notebook: dict, cell_id: Optional[str] = None,
+              cell_index: Optional[int] = None) -> str:
+        """Compute the backward slice of a code cell of the notebook identified by key
+
+        Raises:
+            LookupError: the notebook has no such code cell
+        """
+        index = find_code_cell(notebook, cell_id=cell_id, cell_index=cell_index)
+        if index is None:
+            raise LookupError('Code cell not found in notebook')
+        _, cells = self._update(key, notebook)
+        return slice_cells(cells[:index + 1], index)
+
+    def flush(self) -> None:
+        """Persist unsaved changes now rather than after the delay"""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is not None:
+            timer.cancel()
+            self._save()
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def _prune(self) -> None:
+        while len(self._notebooks) > self.max_notebooks:
+            self._notebooks.popitem(last=False)
+        used = {hash_ for hashes in self._notebooks.values() for hash_ in hashes}
+        for hash_ in set(self._cells) - used:
+            del self._cells[hash_]
+
+    def _load(self) -> None:
+        if self.path is None:
+            return
+        try:
+            with self.path.open() as f:
+                data = json.load(f)
+            if data['version'] != self.version:
+                return
+            cells = {
+                hash_: [
+                    Statement(source, frozenset(defs), frozenset(kills), frozenset(uses), opaque)
+                    for source, defs, kills, uses, opaque in statements
+                ]
+                for hash_, statements in data['cells'].items()
+            }
+            notebooks = OrderedDict(data['notebooks'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        self._cells.update(cells)
+        self._notebooks.update(notebooks)
+
+    def _schedule_save(self) -> None:
+        # called with the lock held
+        if self.path is None or self._save_timer is not None:
+            return
+        # a daemon, so that exiting does not wait for the delay; pending
+        # changes are written at exit by flush instead
+        self._save_timer = threading.Timer(self.save_delay, self._save_scheduled)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def _save_scheduled(self) -> None:
+        with self._lock:
+            if self._save_timer is not threading.current_thread():
+                # flushed meanwhile
+                return
+            self._save_timer = None
+        self._save()
+
+    def _save(self) -> None:
+        # the lock is only held to copy the index, not while writing it, and
+        # saves are serialized so that an older copy never overwrites a newer
+        with self._save_lock:
+            with self._lock:
+                cells = dict(self._cells)
+                notebooks = OrderedDict(self._notebooks)
+            data = {
+                'version': self.version,
+                'cells': {
+                    hash_: [
+                        [s.source, sorted(s.defs), sorted(s.kills), sorted(s.uses), s.opaque]
+                        for s in statements
+                    ]
+                    for hash_, statements in cells.items()
+                },
+                'notebooks': notebooks,
+            }
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix('.tmp')
+                with tmp_path.open('w') as f:
+                    json.dump(data, f)
+                os.replace(str(tmp_path), str(self.path))
+            except OSError:
+                logger.warning('Could not save slice index to %s', self.path, exc_info=True)
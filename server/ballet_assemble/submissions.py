@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def hash_submission(upstream_repo_spec: str, code_contents: Iterable[str]) -> str:
+    """Identify a submission of the code contents to the upstream repo"""
+    data = '\0'.join([upstream_repo_spec, *code_contents])
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class SubmissionLog:
+    """Pull requests opened for submissions, keyed by submission hash and persisted to a file
+
+    Submissions whose pull requests are still being opened can be reserved,
+    so that an identical submission made meanwhile waits for that pull
+    request rather than opening another one.
+
+    Args:
+        path: file to persist the log to
+        max_age: seconds after which a submission is forgotten
+        clock: function returning the current time in seconds since the epoch
+    """
+
+    def __init__(self, path: pathlib.Path, max_age: float,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_age = max_age
+        self.clock = clock
+        self._entries = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get the url of the pull request opened for the submission, if any"""
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None or entry['time'] + self.max_age <= self.clock():
+                return None
+            return entry['url']
+
+    def add(self, key: str, url: str) -> None:
+        with self._lock:
+            entries = self._load()
+            now = self.clock()
+            entries[key] = {'url': url, 'time': now}
+            for old_key in [k for k, e in entries.items() if e['time'] + self.max_age <= now]:
+                del entries[old_key]
+            self._save()
+
+    def reserve(self, key: str) -> Optional[Future]:
+        """Reserve the submission while its pull request is being opened
+
+        Returns:
+            None if the caller now holds the reservation and must ``release``
+            it, otherwise a future of the url of the pull request being opened
+            by the holder, which is None if the holder failed
+        """
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = Future()
+            return pending
+
+    def release(self, key: str, url: Optional[str]) -> None:
+        """Release the reservation, passing the url of the pull request to those waiting"""
+        with self._lock:
+            pending = self._pending.pop(key)
+        pending.set_result(url)
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with self.path.open() as f:
+                    self._entries.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+        return self._entries
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with tmp_path.open('w') as f:
+                json.dump(self._entries, f)
+            os.replace(str(tmp_path), str(self.path))
+        except OSError:
+            logger.warning('Could not save submissions to %s', self.path, exc_info=True)
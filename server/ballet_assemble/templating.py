@@ -0,0 +1,123 @@
+import json
+import os
+import pathlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ballet.templating import FEATURE_TEMPLATE_PATH
+from cookiecutter.environment import StrictEnvironment
+from jinja2 import Template
+
+
+def _detect_newline(path: pathlib.Path) -> str:
+    # like cookiecutter, use the first line ending of the template file
+    with open(path, encoding='utf-8') as f:
+        f.readline()
+    newline = f.newlines[0] if isinstance(f.newlines, tuple) else f.newlines
+    return newline or os.linesep
+
+
+class FeatureTemplate:
+    """Cookiecutter template for new features, compiled once and rendered from memory
+
+    Renders the same files as cookiecutter does for the template, without
+    writing them to disk. Only what ballet's feature template uses is
+    supported: string and choice variables and text files, without hooks.
+
+    Args:
+        path: path to the template, i.e. the directory containing cookiecutter.json
+    """
+
+    def __init__(self, path: pathlib.Path = FEATURE_TEMPLATE_PATH):
+        self.path = pathlib.Path(path)
+        with open(self.path.joinpath('cookiecutter.json'), encoding='utf-8') as f:
+            self.defaults = json.load(f, object_pairs_hook=OrderedDict)
+        self.env = StrictEnvironment(
+            context={'cookiecutter': self.defaults},
+            keep_trailing_newline=True,
+            **self.defaults.get('_jinja2_env_vars', {}),
+        )
+        self.variables = self._compile_variables()
+        self.files = self._compile_files()
+
+    @staticmethod
+    def _is_rendered(key: str) -> bool:
+        # cookiecutter leaves private variables as they are, but renders
+        # variables starting with a double underscore
+        return not key.startswith('_') or key.startswith('__')
+
+    def _compile_variables(self) -> Dict[str, Optional[Template]]:
+        variables = OrderedDict()
+        for key, value in self.defaults.items():
+            if isinstance(value, list):
+                # without input, choice variables take their first option
+                value = value[0]
+            if self._is_rendered(key) and isinstance(value, str):
+                variables[key] = self.env.from_string(value)
+            else:
+                variables[key] = None
+        return variables
+
+    def _compile_files(self) -> List[Tuple[Template, Template, str]]:
+        project_dirs = [
+            p for p in self.path.iterdir()
+            if p.is_dir() and '{{' in p.name and '}}' in p.name
+        ]
+        if len(project_dirs) != 1:
+            raise ValueError(f'Expected a single project directory in template at {self.path}')
+        project_dir = project_dirs[0]
+
+        files = []
+        for path in sorted(project_dir.rglob('*')):
+            if path.is_file() and path.suffix != '.pyc':
+                relpath = path.relative_to(project_dir).as_posix()
+                files.append((
+                    self.env.from_string(relpath),
+                    self.env.from_string(path.read_text(encoding='utf-8')),
+                    _detect_newline(path),
+                ))
+        return files
+
+    def make_context(self, extra_context: Dict[str, str]) -> dict:
+        """Make the context of the template, like cookiecutter does without input"""
+        cookiecutter = OrderedDict()
+        for key, value in self.defaults.items():
+            template = self.variables[key]
+            if key in extra_context:
+                value = extra_context[key]
+                # values given explicitly are rendered too, so only compile those
+                # that might be templates themselves
+                rendered = self._is_rendered(key) and isinstance(value, str)
+                template = self.env.from_string(value) if rendered and '{' in value else None
+            elif isinstance(value, list) and self._is_rendered(key):
+                value = value[0]
+            if template is not None:
+                value = template.render(cookiecutter=cookiecutter)
+            cookiecutter[key] = value
+        cookiecutter['_template'] = str(self.path)
+        cookiecutter['_repo_dir'] = str(self.path)
+        cookiecutter['_checkout'] = None
+        return {
+            'cookiecutter': cookiecutter,
+            '_cookiecutter': {
+                k: extra_context.get(k, v)
+                for k, v in self.defaults.items()
+                if not k.startswith('_')
+            },
+        }
+
+    def render(self, **extra_context: str) -> Dict[str, str]:
+        """Render the template with the given values of its variables
+
+        Returns:
+            mapping from path within the rendered project directory to file
+            contents, with the line endings that cookiecutter would write
+        """
+        context = self.make_context(extra_context)
+        files = {}
+        for path_template, content_template, newline in self.files:
+            content = content_template.render(**context)
+            if newline != '\n':
+                content = content.replace('\n', newline)
+            files[path_template.render(**context)] = content
+        return files
@@ -0,0 +1,86 @@
+import threading
+import weakref
+from typing import TYPE_CHECKING
+
+from tornado.httpclient import AsyncHTTPClient, HTTPResponse
+from tornado.ioloop import IOLoop
+
+try:
+    # libcurl keeps connections alive between requests
+    from tornado.curl_httpclient import CurlAsyncHTTPClient as _AsyncHTTPClient
+except ImportError:
+    from tornado.simple_httpclient import SimpleAsyncHTTPClient as _AsyncHTTPClient
+
+if TYPE_CHECKING:
+    import requests
+
+
+class HTTPTransport:
+    """Pooled HTTP clients shared by all outbound traffic of the extension
+
+    Blocking calls, including those made by PyGithub, go through one requests
+    session whose connection pools keep connections alive between calls.
+    Non-blocking calls go through one tornado client per IOLoop, which also
+    reuses connections if pycurl is installed.
+
+    Args:
+        pool_size: number of connections to keep alive per host
+        timeout: default connect and read timeout in seconds
+        max_clients: number of concurrent non-blocking requests
+    """
+
+    def __init__(self, pool_size: int, timeout: float, max_clients: int):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_clients = max_clients
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def session(self) -> 'requests.Session':
+        # requests is only imported once a blocking call is made
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size,
+                                      pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def request(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> 'requests.Response':
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> 'requests.Response':
+        return self.request('POST', url, **kwargs)
+
+    @property
+    def async_client(self) -> AsyncHTTPClient:
+        loop = IOLoop.current()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = _AsyncHTTPClient(force_instance=True, max_clients=self.max_clients)
+            self._async_clients[loop] = client
+        return client
+
+    async def fetch(self, url: str, **kwargs) -> HTTPResponse:
+        kwargs.setdefault('connect_timeout', self.timeout)
+        kwargs.setdefault('request_timeout', self.timeout)
+        return await self.async_client.fetch(url, **kwargs)
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        for client in list(self._async_clients.values()):
+            client.close()
+        self._async_clients.clear()
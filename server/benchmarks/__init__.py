@@ -0,0 +1,4 @@
+"""Benchmarks for ballet-assemble, run against local stand-ins for GitHub
+
+Run from the server directory, e.g. ``python -m benchmarks.submit --help``.
+"""
@@ -0,0 +1,113 @@
+"""Benchmark of the time to import the server extension
+
+Imports the extension in fresh interpreters with ``python -X importtime``,
+after the notebook server that would already be loaded when the extension
+is, and reports the time spent importing the extension and the modules it
+imports that were not already loaded. Exits with an error if the best time
+exceeds ``--max-ms``, to catch regressions in startup cost.
+
+The package itself imports next to nothing; loading the extension imports
+its handlers and app, so ``ballet_assemble.handlers`` is measured by default.
+
+Usage::
+
+    python -m benchmarks.importtime --module ballet_assemble.handlers --repeat 5 --max-ms 200
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+class ImportTime(NamedTuple):
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> List[ImportTime]:
+    """Parse the output of ``python -X importtime``, in the order modules finished importing"""
+    times = []
+    for line in output.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            times.append(ImportTime(module, len(indent) // 2, int(self_us), int(cumulative_us)))
+    return times
+
+
+def measure(module: str = 'ballet_assemble.handlers',
+            preload: str = 'notebook.notebookapp') -> dict:
+    """Import module in a fresh interpreter after preload
+
+    Returns:
+        total time to import module in seconds, and the time of each module
+        imported on account of it, slowest first
+    """
+    code = f'import {preload}; import {module}' if preload else f'import {module}'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = parse_importtime(result.stderr)
+
+    # modules are listed after those they import, so the modules imported on
+    # account of module are those since the previous top-level import
+    end = max(i for i, t in enumerate(times) if t.module == module and t.depth == 0)
+    start = max((i + 1 for i, t in enumerate(times[:end]) if t.depth == 0), default=0)
+    modules = sorted(times[start:end + 1], key=lambda t: t.self_us, reverse=True)
+    return {
+        'total': times[end].cumulative_us / 1e6,
+        'modules': {t.module: t.self_us / 1e6 for t in modules},
+    }
+
+
+def run(repeat: int, module: str = 'ballet_assemble.handlers',
+        preload: str = 'notebook.notebookapp') -> dict:
+    """Measure repeat times and keep the fastest, which is the least disturbed by noise"""
+    return min((measure(module, preload) for _ in range(repeat)), key=lambda r: r['total'])
+
+
+def format_report(report: dict, top: int) -> str:
+    modules: Dict[str, float] = report['modules']
+    lines = [f'total: {report["total"]:.3f}s', '', f'{"module":<50}{"self":>10}']
+    for name, seconds in list(modules.items())[:top]:
+        lines.append(f'{name:<50}{seconds:>10.4f}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of fresh interpreters to measure')
+    parser.add_argument('--module', default='ballet_assemble.handlers',
+                        help='module to import')
+    parser.add_argument('--preload', default='notebook.notebookapp',
+                        help='module imported beforehand, whose imports are not counted')
+    parser.add_argument('--top', type=int, default=15,
+                        help='number of slowest modules to show')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if importing takes longer than this many milliseconds')
+    parser.add_argument('--json', action='store_true',
+                        help='print results as json instead of a table')
+    args = parser.parse_args(argv)
+
+    report = run(args.repeat, module=args.module, preload=args.preload)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report, args.top))
+
+    if args.max_ms is not None and report['total'] * 1000 > args.max_ms:
+        print(f'Importing {args.module} took {report["total"] * 1000:.0f}ms, '
+              f'more than {args.max_ms:.0f}ms', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Concurrent load test of the extension's handlers
+
+Starts a notebook server with the extension loaded, pointed at a local
+stand-in for GitHub, then fires concurrent submissions, authentication polls
+and token exchanges at it. Meanwhile it probes the unrelated
+``/assemble/status`` endpoint and measures the lag of the server's event loop,
+so that handlers that block the event loop show up as latency for everyone.
+
+Usage::
+
+    python -m benchmarks.load --submits 20 --polls 20 --tokens 5
+"""
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from notebook.tests.launchnotebook import NotebookTestBase
+from tornado.ioloop import IOLoop
+from traitlets.config import Config
+
+from ballet_assemble import load_jupyter_server_extension
+
+from .stub import FEATURE_TEMPLATE, GitHubStub, seed_project
+from .submit import percentile
+
+
+class LoadTestServer(NotebookTestBase):
+    """Notebook server with the extension loaded, run outside of a test runner"""
+
+    port = 12361
+
+    @classmethod
+    def start(cls, config: Config) -> None:
+        cls.config = config
+        cls.setup_class()
+        load_jupyter_server_extension(cls.notebook)
+
+    @classmethod
+    def stop(cls) -> None:
+        cls.teardown_class()
+
+
+class LoopLagProbe:
+    """Measure how late callbacks run on an event loop
+
+    Args:
+        io_loop: loop to probe, possibly running in another thread
+        interval: seconds between probes
+    """
+
+    def __init__(self, io_loop: IOLoop, interval: float = 0.01):
+        self.io_loop = io_loop
+        self.interval = interval
+        self.lags = []
+        self._running = False
+        self._expected = None
+
+    def start(self) -> None:
+        self._running = True
+        self.io_loop.add_callback(self._schedule)
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _schedule(self):
+        self._expected = self.io_loop.time() + self.interval
+        self.io_loop.call_at(self._expected, self._tick)
+
+    def _tick(self):
+        self.lags.append(max(self.io_loop.time() - self._expected, 0.0))
+        if self._running:
+            self._schedule()
+
+
+class Recorder:
+    """Thread-safe record of latencies and outcomes by kind of request"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, latency: float, outcome: str = 'ok') -> None:
+        with self._lock:
+            self.latencies.setdefault(kind, []).append(latency)
+            outcomes = self.outcomes.setdefault(kind, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def record_error(self, message: str) -> None:
+        with self._lock:
+            self.errors[message] += 1
+
+
+def submit(server, recorder: Recorder, i: int, timeout: float) -> None:
+    start = time.perf_counter()
+    response = server.request('POST', '/assemble/submit', json={
+        'codeContent': FEATURE_TEMPLATE.format(i=f'load_{i}'),
+    })
+    recorder.record('submit (accept)', time.perf_counter() - start, str(response.status_code))
+    if response.status_code != 202:
+        return
+
+    job_id = response.json()['id']
+    while time.perf_counter() - start < timeout:
+        job = server.request('GET', f'/assemble/submit/{job_id}').json()
+        if job['status'] == 'done':
+            outcome = 'ok' if job['response']['result'] else 'failed'
+            if outcome == 'failed':
+                recorder.record_error(job['response'].get('message') or 'unknown error')
+            recorder.record('submit (complete)', time.perf_counter() - start, outcome)
+            return
+        time.sleep(0.1)
+    recorder.record('submit (complete)', time.perf_counter() - start, 'timeout')
+
+
+def poll(server, recorder: Recorder, refresh: bool) -> None:
+    path = '/assemble/auth/authenticated?wait=5' + ('&refresh=1' if refresh else '')
+    start = time.perf_counter()
+    response = server.request('GET', path)
+    outcome = str(response.json()['result']) if response.ok else str(response.status_code)
+    recorder.record('auth poll', time.perf_counter() - start, outcome)
+
+
+def exchange_token(server, recorder: Recorder) -> None:
+    start = time.perf_counter()
+    response = server.request('POST', '/assemble/auth/token')
+    recorder.record('token', time.perf_counter() - start, str(response.status_code))
+
+
+def probe_status(server, recorder: Recorder, done: threading.Event,
+                 interval: float = 0.05) -> None:
+    while not done.is_set():
+        start = time.perf_counter()
+        response = server.request('GET', '/assemble/status')
+        recorder.record('status probe', time.perf_counter() - start, str(response.status_code))
+        done.wait(interval)
+
+
+def run(submits: int, polls: int, tokens: int, refresh: bool = False, latency: float = 0.0,
+        timeout: float = 300.0, **config) -> dict:
+    """Fire the given numbers of concurrent requests at a server with the extension
+
+    Returns:
+        summary of latencies, outcomes, throughput and event loop lag
+    """
+    with tempfile.TemporaryDirectory() as dirname, GitHubStub(latency=latency) as stub:
+        paths = seed_project(dirname, 10, username=stub.username)
+        LoadTestServer.start(Config({'AssembleApp': {
+            'ballet_yml_path': str(paths['project']),
+            'github_token': 'bench-token',
+            'github_api_url': stub.url,
+            'oauth_gateway_url': stub.url,
+            'git_remote_url_template': paths['remote_url_template'],
+            'cache_dir': f'{dirname}/cache',
+            'debug': False,
+            **config,
+        }}))
+        try:
+            server = LoadTestServer
+            recorder = Recorder()
+            probe = LoopLagProbe(server.notebook.io_loop)
+            done = threading.Event()
+            prober = threading.Thread(target=probe_status, args=(server, recorder, done))
+
+            probe.start()
+            prober.start()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(submits + polls + tokens, 1)) as pool:
+                futures = [pool.submit(submit, server, recorder, i, timeout)
+                           for i in range(submits)]
+                futures += [pool.submit(poll, server, recorder, refresh) for _ in range(polls)]
+                futures += [pool.submit(exchange_token, server, recorder)
+                            for _ in range(tokens)]
+                for future in futures:
+                    future.result()
+            elapsed = time.perf_counter() - start
+            done.set()
+            prober.join()
+            probe.stop()
+        finally:
+            LoadTestServer.stop()
+
+    completed = recorder.outcomes.get('submit (complete)', {}).get('ok', 0)
+    return {
+        'elapsed': elapsed,
+        'throughput': completed / elapsed,
+        'requests': {
+            kind: {
+                'count': len(latencies),
+                'outcomes': recorder.outcomes[kind],
+                'p50': percentile(latencies, 0.5),
+                'p95': percentile(latencies, 0.95),
+                'p99': percentile(latencies, 0.99),
+                'max': max(latencies),
+            }
+            for kind, latencies in recorder.latencies.items()
+        },
+        'errors': dict(recorder.errors.most_common()),
+        'loop_lag': {
+            'p50': percentile(probe.lags, 0.5) if probe.lags else 0.0,
+            'p99': percentile(probe.lags, 0.99) if probe.lags else 0.0,
+            'max': max(probe.lags, default=0.0),
+        },
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [f'{"requests":<20}{"count":>7}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}  outcomes']
+    for kind, row in report['requests'].items():
+        outcomes = ', '.join(f'{k}={v}' for k, v in sorted(row['outcomes'].items()))
+        lines.append(f'{kind:<20}{row["count"]:>7}{row["p50"]:>9.3f}{row["p95"]:>9.3f}'
+                     f'{row["p99"]:>9.3f}{row["max"]:>9.3f}  {outcomes}')
+    lag = report['loop_lag']
+    lines.append('')
+    lines.append('event loop lag: p50={p50:.3f}s p99={p99:.3f}s max={max:.3f}s'.format(**lag))
+    lines.append('throughput: {throughput:.2f} submissions/s over {elapsed:.1f}s'.format(**report))
+    for message, count in report['errors'].items():
+        lines.append(f'{count} failed submission(s): {message}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--submits', type=int, default=20,
+                        help='number of concurrent submissions')
+    parser.add_argument('--polls', type=int, default=20,
+                        help='number of concurrent authentication polls')
+    parser.add_argument('--tokens', type=int, default=5,
+                        help='number of concurrent token exchanges')
+    parser.add_argument('--refresh', action='store_true',
+                        help='have authentication polls check the token with GitHub')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds of simulated latency per GitHub API request')
+    parser.add_argument('--submit-workers', type=int, default=None,
+                        help='number of submissions to run at once (AssembleApp.submit_workers)')
+    parser.add_argument('--submit-queue-size', type=int, default=None,
+                        help='number of submissions that may wait '
+                             '(AssembleApp.submit_queue_size)')
+    parser.add_argument('--json', action='store_true',
+                        help='print results as json instead of a table')
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.submit_workers is not None:
+        config['submit_workers'] = args.submit_workers
+    if args.submit_queue_size is not None:
+        config['submit_queue_size'] = args.submit_queue_size
+
+    report = run(args.submits, args.polls, args.tokens, refresh=args.refresh,
+                 latency=args.latency, **config)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
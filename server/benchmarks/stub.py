@@ -0,0 +1,196 @@
+"""Local stand-ins for the GitHub API, the oauth gateway and a forked Ballet project"""
+
+import json
+import pathlib
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import git
+from ballet.templating import render_project_template
+
+PROJECT_CONTEXT = {
+    'full_name': 'Bench Owner',
+    'email': 'owner@example.com',
+    'github_owner': 'owner',
+    'project_name': 'Bench',
+    'project_slug': 'ballet-bench',
+    'package_slug': 'bench',
+}
+
+FEATURE_TEMPLATE = '''\
+from ballet import Feature
+from ballet.eng.external import SimpleImputer
+
+input = "column_{i}"
+transformer = SimpleImputer(strategy="mean")
+name = "Imputed column {i}"
+feature = Feature(input, transformer, name=name)
+'''
+
+
+class GitHubStub:
+    """HTTP server answering the GitHub API and oauth gateway requests made by ballet-assemble
+
+    Use as a context manager to serve in a background thread. Each request
+    is counted by route in ``requests``.
+
+    Args:
+        username: login of the authenticated user
+        latency: seconds to wait before answering each request, to simulate
+            a remote server
+    """
+
+    def __init__(self, username: str = 'bench-user', latency: float = 0.0):
+        self.username = username
+        self.latency = latency
+        self.requests = Counter()
+        self._pulls = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def __enter__(self) -> 'GitHubStub':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def repo(self, owner: str, name: str) -> dict:
+        return {
+            'id': 1,
+            'name': name,
+            'full_name': f'{owner}/{name}',
+            'owner': {'login': owner},
+            'url': f'{self.url}/repos/{owner}/{name}',
+            'html_url': f'{self.url}/{owner}/{name}',
+            'default_branch': 'master',
+            'fork': owner == self.username,
+        }
+
+    def pull(self, owner: str, name: str) -> dict:
+        with self._lock:
+            self._pulls += 1
+            number = self._pulls
+        return {
+            'id': number,
+            'number': number,
+            'state': 'open',
+            'url': f'{self.url}/repos/{owner}/{name}/pulls/{number}',
+            'html_url': f'{self.url}/{owner}/{name}/pull/{number}',
+        }
+
+    def route(self, method: str, path: str, body: Optional[dict]):
+        """Answer a request with a status code and a json-serializable body"""
+        path = path.split('?', 1)[0]
+        routes = [
+            ('GET', r'/user', lambda: (200, {'login': self.username, 'id': 1})),
+            ('GET', r'/repos/([^/]+)/([^/]+)', lambda o, n: (200, self.repo(o, n))),
+            ('POST', r'/repos/([^/]+)/([^/]+)/forks',
+             lambda o, n: (202, self.repo(self.username, n))),
+            ('GET', r'/repos/([^/]+)/([^/]+)/branches/([^/]+)',
+             lambda o, n, b: (200, {'name': b, 'commit': {'sha': '0' * 40}})),
+            ('POST', r'/repos/([^/]+)/([^/]+)/pulls', lambda o, n: (201, self.pull(o, n))),
+            ('GET', r'/search/issues', lambda: (200, {'total_count': 0, 'items': []})),
+            ('GET', r'/status', lambda: (200, {'status': 'ok'})),
+            ('GET', r'/api/v1/app_id', lambda: (200, {'client_id': 'bench-client-id'})),
+            ('POST', r'/api/v1/access_token', lambda: (200, {
+                'access_token': 'bench-token',
+                'scope': 'repo,gist',
+                'token_type': 'bearer',
+                'message': None,
+            })),
+        ]
+        for route_method, pattern, func in routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                with self._lock:
+                    self.requests[f'{method} {pattern}'] += 1
+                return func(*match.groups())
+        with self._lock:
+            self.requests['not found'] += 1
+        return 404, {'message': 'Not Found'}
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                data = self.rfile.read(length) if length else b''
+                body = json.loads(data) if data else None
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, response = stub.route(self.command, self.path, body)
+                payload = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('X-RateLimit-Limit', '5000')
+                self.send_header('X-RateLimit-Remaining', '5000')
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PATCH = _handle
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def seed_project(root: pathlib.Path, history: int, username: str = 'bench-user') -> dict:
+    """Create a Ballet project with some history and a bare fork of it to push to
+
+    Args:
+        root: directory to create the project and fork in
+        history: number of features to commit to the project, one per commit
+        username: owner of the fork
+
+    Returns:
+        paths of the project working copy ('project'), the fork ('fork') and
+        a template for the url of the fork ('remote_url_template')
+    """
+    root = pathlib.Path(root).resolve()
+    project_path = pathlib.Path(render_project_template(
+        no_input=True, output_dir=str(root), extra_context=PROJECT_CONTEXT))
+    repo = git.Repo(str(project_path))
+    with repo.config_writer() as writer:
+        writer.set_value('user', 'name', PROJECT_CONTEXT['full_name'])
+        writer.set_value('user', 'email', PROJECT_CONTEXT['email'])
+
+    contrib_dir = project_path.joinpath('src', PROJECT_CONTEXT['package_slug'], 'features',
+                                        'contrib', 'user_seed')
+    contrib_dir.mkdir(parents=True, exist_ok=True)
+    init_path = contrib_dir.joinpath('__init__.py')
+    init_path.touch()
+    repo.index.add([str(init_path.relative_to(project_path))])
+    repo.index.commit('Add seed user')
+    for i in range(history):
+        path = contrib_dir.joinpath(f'feature_{i}.py')
+        path.write_text(FEATURE_TEMPLATE.format(i=i))
+        repo.index.add([str(path.relative_to(project_path))])
+        repo.index.commit(f'Add feature {i}')
+
+    reponame = PROJECT_CONTEXT['project_slug']
+    fork_path = root.joinpath('remotes', username, f'{reponame}.git')
+    git.Repo.clone_from(str(project_path), str(fork_path), bare=True)
+
+    return {
+        'project': project_path,
+        'fork': fork_path,
+        'remote_url_template': root.joinpath('remotes').as_uri() + '/{username}/{reponame}.git',
+    }
@@ -0,0 +1,144 @@
+"""End-to-end benchmark of submitting a feature
+
+Runs the real submission pipeline of ``AssembleApp`` against a local bare
+repo standing in for the user's fork and a local HTTP server standing in for
+the GitHub API, for synthetic Ballet projects with several history sizes,
+and reports the latency of each stage of the pipeline.
+
+Usage::
+
+    python -m benchmarks.submit --history 0 100 1000 --repeat 5
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from ballet_assemble.app import AssembleApp
+
+from .stub import FEATURE_TEMPLATE, GitHubStub, seed_project
+
+# stages reported first, in pipeline order, under short names. The formatter
+# validates and formats the code in the same call, so formatting is timed
+# when the code is checked and writing it later hits the formatter's cache
+STAGES = {
+    'check_code_is_valid': 'blacken',
+    'fork_repo': 'fork',
+    'clone_repo': 'clone',
+    'start_new_feature': 'template',
+    'write_code_content': 'write',
+    'commit_changes': 'commit',
+    'push_to_remote': 'push',
+    'create_pull_request': 'pr',
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q * (len(values) - 1))))
+    return values[index]
+
+
+def run(history: int, repeat: int, latency: float = 0.0, verbose: bool = False,
+        **config) -> List[Dict[str, float]]:
+    """Submit repeat features to a project with the given history
+
+    Returns:
+        timings of the stages of each submission, in seconds, including the
+        total under 'total'
+    """
+    with tempfile.TemporaryDirectory() as dirname, GitHubStub(latency=latency) as stub:
+        paths = seed_project(dirname, history, username=stub.username)
+
+        AssembleApp.clear_instance()
+        app = AssembleApp.instance(
+            ballet_yml_path=str(paths['project']),
+            github_token='bench-token',
+            github_api_url=stub.url,
+            oauth_gateway_url=stub.url,
+            git_remote_url_template=paths['remote_url_template'],
+            cache_dir=f'{dirname}/cache',
+            debug=False,
+            **config,
+        )
+        if not verbose:
+            app.log.setLevel(logging.WARNING)
+            logging.getLogger('ballet').setLevel(logging.WARNING)
+        # start the formatter's workers, which are running after the first submission
+        app.formatter.blacken('x = 0\n')
+
+        results = []
+        for i in range(repeat):
+            job = app.jobs.create()
+            start = time.perf_counter()
+            response = app.jobs.run(job, app.create_pull_request_for_code_content, {
+                'codeContent': FEATURE_TEMPLATE.format(i=f'{history}_{i}'),
+            })
+            total = time.perf_counter() - start
+            if not response['result']:
+                raise RuntimeError(f'Submission failed: {response["message"]}\n{response["tb"]}')
+            results.append({**job.timings, 'total': total})
+
+        app.formatter.shutdown()
+        AssembleApp.clear_instance()
+        return results
+
+
+def summarize(results: List[Dict[str, float]]) -> List[Dict[str, object]]:
+    """Summarize timings by stage: the first (cold) run and the median and p95 of the rest"""
+    names = list(results[0])
+    stages = [s for s in STAGES if s in names] + \
+        [s for s in names if s not in STAGES and s != 'total'] + ['total']
+    warm = results[1:] or results
+    rows = []
+    for stage in stages:
+        values = [r.get(stage, 0.0) for r in warm]
+        rows.append({
+            'stage': STAGES.get(stage, stage),
+            'cold': results[0].get(stage, 0.0),
+            'median': statistics.median(values),
+            'p95': percentile(values, 0.95),
+        })
+    return rows
+
+
+def format_table(history: int, rows: List[Dict[str, object]]) -> str:
+    lines = [f'history={history}', f'{"stage":<22}{"cold":>10}{"median":>10}{"p95":>10}']
+    for row in rows:
+        lines.append('{stage:<22}{cold:>10.3f}{median:>10.3f}{p95:>10.3f}'.format(**row))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--history', type=int, nargs='+', default=[0, 100, 1000],
+                        help='numbers of commits in the synthetic projects')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of submissions per project')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds of simulated latency per GitHub API request')
+    parser.add_argument('--no-mirror', dest='use_mirror', action='store_false',
+                        help='clone from the fork every time instead of a local mirror')
+    parser.add_argument('--verbose', action='store_true',
+                        help='show the log of each submission')
+    parser.add_argument('--json', action='store_true',
+                        help='print results as json instead of tables')
+    args = parser.parse_args(argv)
+
+    report = {}
+    for history in args.history:
+        results = run(history, args.repeat, latency=args.latency, verbose=args.verbose,
+                      use_mirror=args.use_mirror)
+        report[history] = summarize(results)
+        if not args.json:
+            print(format_table(history, report[history]), end='\n\n', flush=True)
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
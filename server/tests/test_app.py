@@ -1,9 +1,17 @@
+import contextlib
 import http
+import json
+import os
+import threading
+import time
 from dataclasses import asdict
-from unittest.mock import Mock, patch
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import Mock, PropertyMock, patch
 
+import git
+import nbformat
 import pytest
-import requests
+from github import GithubException, UnknownObjectException
 from notebook.tests.launchnotebook import NotebookTestBase
 from packaging.version import Version
 from traitlets.config import Config
@@ -13,6 +21,18 @@ from ballet_assemble import load_jupyter_server_extension
 from ballet_assemble.app import AssembleApp
 
 
+@contextlib.contextmanager
+def serve(handler_class):
+    server = HTTPServer(('127.0.0.1', 0), handler_class)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
 @pytest.fixture
 def config():
     return Config(**{
@@ -26,6 +46,430 @@ def test_app_config(config):
     assert app.debug in {True, False}
 
 
+def test_make_github():
+    app = AssembleApp(http_timeout=2.5, github_api_url='http://127.0.0.1:1')
+    github = app.make_github('token')
+
+    requester = github._Github__requester
+    assert requester._Requester__timeout == 3
+    assert requester._Requester__hostname == '127.0.0.1'
+
+
+@patch('github.Github')
+def test_github_identity_is_cached(mock_github):
+    mock_github.return_value.get_user.return_value.login = 'username'
+    app = AssembleApp(github_token='token1')
+
+    assert app.username == 'username'
+    assert app.username == 'username'
+    assert app.github is app.github
+    mock_github.assert_called_once()
+    assert mock_github.call_args[0] == ('token1',)
+    mock_github.return_value.get_user.assert_called_once()
+
+    app.set_github_token('token2')
+    assert app.username == 'username'
+    assert mock_github.call_count == 2
+    assert mock_github.return_value.get_user.call_count == 2
+
+
+def test_is_authenticated_caches_results():
+    app = AssembleApp(github_token='token', auth_positive_ttl=60, auth_negative_ttl=60)
+
+    with patch.object(AssembleApp, '_check_authenticated', return_value=False) as mock_check:
+        assert not app.is_authenticated()
+        assert not app.is_authenticated()
+        mock_check.assert_called_once()
+
+        mock_check.return_value = True
+        assert app.is_authenticated(refresh=True)
+        assert app.is_authenticated()
+        assert mock_check.call_count == 2
+
+        # token revoked
+        mock_check.return_value = False
+        assert not app.is_authenticated(refresh=True)
+
+        app.set_github_token('other')
+        app.is_authenticated()
+        assert mock_check.call_count == 4
+
+
+def test_client_id_is_persisted(tmp_path):
+    app = AssembleApp(cache_dir=str(tmp_path), oauth_gateway_url='http://gateway')
+    assert app.cached_client_id is None
+
+    app._store_client_id('abc')
+
+    other = AssembleApp(cache_dir=str(tmp_path), oauth_gateway_url='http://gateway')
+    assert other.cached_client_id == 'abc'
+    assert other.client_id == 'abc'
+    other.oauth_gateway_url = 'http://other'
+    assert other.cached_client_id is None
+
+
+@patch('time.sleep')
+def test_warm_fork(mock_sleep):
+    app = AssembleApp(debug=False)
+    github = Mock()
+    upstream = Mock()
+    fork = upstream.create_fork.return_value
+    fork.get_branch.side_effect = [GithubException(404, {}, {}), Mock()]
+
+    def get_repo(spec):
+        if spec == 'owner/foo':
+            return upstream
+        raise UnknownObjectException(404, {}, {})
+
+    github.get_repo.side_effect = get_repo
+
+    with patch.object(AssembleApp, 'github', new_callable=PropertyMock) as mock_github, \
+            patch.object(AssembleApp, 'username', new_callable=PropertyMock) as mock_username, \
+            patch.object(AssembleApp, 'reponame', new_callable=PropertyMock) as mock_reponame, \
+            patch.object(AssembleApp, 'upstream_repo_spec',
+                         new_callable=PropertyMock) as mock_spec:
+        mock_github.return_value = github
+        mock_username.return_value = 'username'
+        mock_reponame.return_value = 'foo'
+        mock_spec.return_value = 'owner/foo'
+
+        assert not app.is_fork_ready()
+        app.warm_fork()
+        assert app.is_fork_ready()
+        assert fork.get_branch.call_count == 2
+        mock_sleep.assert_called_once()
+
+        # later submissions skip creating the fork
+        app.fork_repo()
+        upstream.create_fork.assert_called_once()
+
+
+@pytest.mark.parametrize('status,forgotten', [(404, True), (403, True), (500, False)])
+def test_fork_is_forgotten_when_missing(github, tmp_path, status, forgotten):
+    app = AssembleApp(submit_engine='api', debug=False, format_workers=0,
+                      cache_dir=str(tmp_path))
+    repo = github.get_repo.return_value
+    repo.get_contents.side_effect = UnknownObjectException(404, {}, {})
+    repo.create_git_tree.side_effect = GithubException(status, {}, {})
+    app._ready_forks = {app.fork_key}
+
+    result = app.create_pull_request_for_code_content({'codeContent': 'x=1'})
+    assert not result['result']
+    repo.create_fork.assert_not_called()
+    assert app.is_fork_ready() != forgotten
+
+    # the next submission asks GitHub to fork again
+    repo.create_git_tree.side_effect = None
+    result = app.create_pull_request_for_code_content({'codeContent': 'x=1'})
+    assert result['result']
+    assert repo.create_fork.call_count == (1 if forgotten else 0)
+
+
+def test_project_is_cached_until_config_changes(tmp_path):
+    config_path = tmp_path / 'ballet.yml'
+    config_path.write_text('project:\n  package_slug: assemble_test_project\n')
+    package_path = tmp_path / 'src' / 'assemble_test_project'
+    package_path.mkdir(parents=True)
+    package_path.joinpath('__init__.py').touch()
+    app = AssembleApp(ballet_yml_path=str(tmp_path))
+
+    project = app.project
+    assert app.project is project
+
+    stat = config_path.stat()
+    os.utime(str(config_path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert app.project is not project
+
+
+@pytest.fixture
+def remote(tmp_path):
+    repo = git.Repo.init(str(tmp_path / 'remote'))
+    with repo.config_writer() as writer:
+        writer.set_value('user', 'name', 'Foo Bar')
+        writer.set_value('user', 'email', 'foo@bar.com')
+    files = {
+        'ballet.yml': 'project:\n  package_slug: foo\n',
+        'src/foo/__init__.py': '',
+        'src/foo/features/contrib/__init__.py': '',
+        'data/train.csv': 'data/train.csv',
+    }
+    for name, content in files.items():
+        path = tmp_path / 'remote' / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        repo.index.add([name])
+        repo.index.commit(f'Add {name}')
+    return repo
+
+
+@pytest.fixture
+def github():
+    """Mock GitHub client, patched into AssembleApp with the user's project"""
+    project = Mock()
+    project.config.get.side_effect = {
+        'contrib.module_path': 'src/foo/features/contrib',
+        'github.github_owner': 'owner',
+        'project.project_slug': 'foo',
+    }.get
+    github = Mock()
+    github.get_repo.return_value.create_pull.return_value.html_url = 'url'
+
+    with patch.object(AssembleApp, 'github', new_callable=PropertyMock, return_value=github), \
+            patch.object(AssembleApp, 'username', new_callable=PropertyMock,
+                         return_value='some-user'), \
+            patch.object(AssembleApp, 'project', new_callable=PropertyMock,
+                         return_value=project):
+        yield github
+
+
+@pytest.mark.parametrize('use_mirror', [True, False])
+def test_clone_repo_strategies(remote, github, tmp_path, use_mirror):
+    app = AssembleApp(cache_dir=str(tmp_path / 'cache'), use_mirror=use_mirror,
+                      clone_depth=1, clone_filter='blob:none', sparse_checkout=True)
+    url = 'file://' + remote.working_tree_dir
+    dirname = tmp_path / 'clone'
+
+    with patch.object(AssembleApp, 'repo_url', new_callable=PropertyMock, return_value=url):
+        repo = app.clone_repo(str(dirname))
+
+    assert repo.head.commit == remote.head.commit
+    assert dirname.joinpath('src', 'foo', 'features', 'contrib', '__init__.py').exists()
+    assert not dirname.joinpath('data').exists()
+    if not use_mirror:
+        assert len(list(repo.iter_commits())) == 1
+
+
+def test_submit_features_with_git_in_parallel(remote, github, tmp_path):
+    app = AssembleApp(cache_dir=str(tmp_path / 'cache'), use_mirror=False, debug=True,
+                      format_workers=0)
+    url = 'file://' + remote.working_tree_dir
+    cwd = os.getcwd()
+    results = {}
+    barrier = threading.Barrier(4)
+
+    def submit(i):
+        barrier.wait()
+        results[i] = app.submit_features_with_git([f'x = {i}', f'y = {i}'], combined=False)
+
+    with patch.object(AssembleApp, 'repo_url', new_callable=PropertyMock, return_value=url):
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert os.getcwd() == cwd
+    assert len(results) == 4
+    branch_names = [branch_name for result in results.values() for _, branch_name in result]
+    assert len(set(branch_names)) == 8
+
+
+def test_create_pull_request_with_api_engine(github, tmp_path):
+    app = AssembleApp(submit_engine='api', debug=False, format_workers=0,
+                      cache_dir=str(tmp_path))
+    repo = github.get_repo.return_value
+
+    def get_contents(path, ref=None):
+        if path == 'src/foo/features/contrib':
+            return [Mock(path='src/foo/features/contrib/__init__.py')]
+        raise UnknownObjectException(404, {}, {})
+
+    repo.get_contents.side_effect = get_contents
+
+    with patch.object(AssembleApp, 'clone_repo') as mock_clone:
+        result = app.create_pull_request_for_code_content({'codeContent': 'x=1'})
+
+    assert result['result'] and result['url'] == 'url'
+    mock_clone.assert_not_called()
+
+    tree = repo.create_git_tree.call_args[0][0]
+    paths = sorted(element._InputGitTreeElement__path for element in tree)
+    user_dir = 'src/foo/features/contrib/user_some_user'
+    assert paths[0] == f'{user_dir}/__init__.py'
+    assert paths[1].startswith(f'{user_dir}/feature_')
+    assert len(paths) == 2
+    contents = {
+        element._InputGitTreeElement__path: element._InputGitTreeElement__content
+        for element in tree
+    }
+    assert contents[paths[1]] == 'x = 1\n'
+
+    _, branch_sha = repo.create_git_ref.call_args[0]
+    assert branch_sha == repo.create_git_commit.return_value.sha
+
+
+def test_create_pull_requests_with_api_engine(github, tmp_path):
+    app = AssembleApp(submit_engine='api', debug=False, format_workers=0,
+                      cache_dir=str(tmp_path))
+    repo = github.get_repo.return_value
+    repo.get_contents.side_effect = UnknownObjectException(404, {}, {})
+
+    with patch.object(AssembleApp, 'fork_repo') as mock_fork:
+        result = app.create_pull_requests_for_code_contents({
+            'codeContents': ['x=1', 'x=', 'y=2'],
+        })
+        assert [r['result'] for r in result['responses']] == [True, False, True]
+        assert not result['result']
+        assert repo.create_git_ref.call_count == 2
+        assert repo.create_pull.call_count == 2
+
+        repo.reset_mock()
+        result = app.create_pull_requests_for_code_contents({
+            'codeContents': ['x=1', 'y=2'],
+            'combined': True,
+        })
+        assert result['result']
+        assert [r['url'] for r in result['responses']] == ['url', 'url']
+        assert repo.create_git_ref.call_count == 1
+        assert repo.create_pull.call_count == 1
+        assert repo.create_pull.call_args[1]['title'] == 'Propose new features'
+        tree = repo.create_git_tree.call_args[0][0]
+        paths = [element._InputGitTreeElement__path for element in tree]
+        assert len([path for path in paths if '/feature_' in path]) == 2
+        assert len(paths) == len(set(paths))
+
+    assert mock_fork.call_count == 2
+
+
+def test_batch_keeps_pull_requests_opened_before_failure(github, tmp_path):
+    app = AssembleApp(submit_engine='api', debug=False, format_workers=0,
+                      cache_dir=str(tmp_path))
+    repo = github.get_repo.return_value
+    repo.get_contents.side_effect = UnknownObjectException(404, {}, {})
+    repo.create_pull.side_effect = [Mock(html_url='url1'), GithubException(500, {}, {})]
+
+    with patch.object(AssembleApp, 'fork_repo'):
+        result = app.create_pull_requests_for_code_contents({
+            'codeContents': ['x=1', 'y=2', 'z=3'],
+        })
+
+    first, second, third = result['responses']
+    assert first['result'] and first['url'] == 'url1'
+    assert not second['result'] and not third['result']
+    assert not result['result']
+
+    # a retry only opens pull requests for the code contents that failed
+    repo.create_pull.side_effect = None
+    repo.create_pull.return_value.html_url = 'url2'
+    with patch.object(AssembleApp, 'fork_repo'):
+        result = app.create_pull_requests_for_code_contents({
+            'codeContents': ['x=1', 'y=2', 'z=3'],
+        })
+    assert [r['url'] for r in result['responses']] == ['url1', 'url2', 'url2']
+    assert repo.create_pull.call_count == 4
+
+
+@pytest.mark.parametrize('search', [False, True])
+def test_duplicate_submission(github, tmp_path, search):
+    app = AssembleApp(submit_engine='api', debug=False, format_workers=0,
+                      cache_dir=str(tmp_path), search_open_pull_requests=search)
+    github.search_issues.return_value = [Mock(html_url='url')]
+    repo = github.get_repo.return_value
+    repo.get_contents.side_effect = UnknownObjectException(404, {}, {})
+
+    with patch.object(AssembleApp, 'fork_repo') as mock_fork:
+        if search:
+            # the log is empty but the pull request is found on GitHub
+            first = app.create_pull_request_for_code_content({'codeContent': 'x=1'})
+            assert first['message'] is not None
+            assert 'repo:owner/foo' in github.search_issues.call_args[0][0]
+        else:
+            first = app.create_pull_request_for_code_content({'codeContent': 'x=1'})
+            assert first['message'] is None
+            submission_hash = app.hash_submission(['x=1'])
+            assert submission_hash in repo.create_pull.call_args[1]['body']
+
+            # formatting differences do not matter
+            second = app.create_pull_request_for_code_content({'codeContent': 'x = 1'})
+            assert second['result'] and second['url'] == first['url']
+            assert second['message'] is not None
+
+            # the log survives restarts
+            other = AssembleApp(cache_dir=str(tmp_path))
+            assert other.submission_log.get(submission_hash) == 'url'
+
+    assert repo.create_pull.call_count == (0 if search else 1)
+    assert mock_fork.call_count == (0 if search else 1)
+
+
+def test_concurrent_duplicate_submissions(github, tmp_path):
+    app = AssembleApp(submit_engine='api', debug=False, format_workers=0,
+                      cache_dir=str(tmp_path), search_open_pull_requests=False)
+    repo = github.get_repo.return_value
+    repo.get_contents.side_effect = UnknownObjectException(404, {}, {})
+    pull_request = repo.create_pull.return_value
+
+    def create_pull(*args, **kwargs):
+        # the second submission arrives while the pull request is being opened
+        time.sleep(0.5)
+        return pull_request
+
+    repo.create_pull.side_effect = create_pull
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def submit(code_content):
+        barrier.wait()
+        results[code_content] = app.create_pull_request_for_code_content(
+            {'codeContent': code_content})
+
+    with patch.object(AssembleApp, 'fork_repo') as mock_fork:
+        threads = [threading.Thread(target=submit, args=(c,)) for c in ['x=1', 'x = 1']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert [r['url'] for r in results.values()] == ['url', 'url']
+    assert sorted(r['message'] is None for r in results.values()) == [False, True]
+    assert repo.create_pull.call_count == 1
+    assert mock_fork.call_count == 1
+
+
+def test_concurrent_batches_in_opposite_order(github, tmp_path):
+    app = AssembleApp(submit_engine='api', debug=False, format_workers=0,
+                      cache_dir=str(tmp_path), search_open_pull_requests=False)
+    repo = github.get_repo.return_value
+    repo.get_contents.side_effect = UnknownObjectException(404, {}, {})
+    find_submission = app.find_submission
+
+    def slow_find_submission(key):
+        # both jobs hold a reservation before either asks for the next
+        time.sleep(0.2)
+        return find_submission(key)
+
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def submit(code_contents):
+        barrier.wait()
+        results[tuple(code_contents)] = app.create_pull_requests_for_code_contents(
+            {'codeContents': code_contents})
+
+    with patch.object(app, 'find_submission', side_effect=slow_find_submission), \
+            patch.object(AssembleApp, 'fork_repo'):
+        threads = [
+            threading.Thread(target=submit, args=(c,), daemon=True)
+            for c in [['x=1', 'y=2'], ['y=2', 'x=1']]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        assert not any(thread.is_alive() for thread in threads)
+
+    assert all(result['result'] for result in results.values())
+    assert repo.create_pull.call_count == 2
+
+
+def test_duplicate_submission_wait_times_out(github, tmp_path):
+    app = AssembleApp(cache_dir=str(tmp_path), duplicate_submission_wait=0.1)
+    assert app.submission_log.reserve('key') is None
+
+    with pytest.raises(TimeoutError):
+        app.reserve_submission('key')
+
+
 class BaseTestCase(NotebookTestBase):
 
     @classmethod
@@ -55,6 +499,19 @@ class AssembleHandlersTest(BaseTestCase):
         project_version = d['project']
         assert project_version is None or isinstance(project_version, str)
 
+    def test_metrics(self):
+        self.request('GET', '/assemble/status')
+        self.submit_and_wait('')
+
+        response = self.request('GET', '/assemble/metrics')
+        assert response.ok
+        assert response.headers['Content-Type'].startswith('text/plain')
+        text = response.text
+        assert ('ballet_assemble_http_requests_total'
+                '{handler="StatusHandler",method="GET",status="200"}') in text
+        assert 'stage="check_code_is_valid",outcome="error"' in text
+        assert 'ballet_assemble_stage_errors_total' in text
+
     def test_config(self):
         traits = AssembleApp.class_own_traits()
 
@@ -76,33 +533,110 @@ class AssembleHandlersTest(BaseTestCase):
 
         assert response.status_code == http.HTTPStatus.FOUND
 
-    @patch('ballet_assemble.handlers.requests')
-    def test_auth_token(self, mock_requests):
-        mock_response = Mock(spec=requests.Response)
-        mock_requests.post.return_value = mock_response
+    def test_auth_authorize_with_cached_client_id(self):
+        self.app._store_client_id('abc')
+
+        response = self.request('GET', '/assemble/auth/authorize', allow_redirects=False)
+
+        assert response.status_code == http.HTTPStatus.FOUND
+        assert 'client_id=abc' in response.headers['Location']
+
+    def test_auth_token(self):
         token = 'e72e16c7e42f292c6912e7710c838347ae178b4a'
-        mock_response.json.return_value = {
-            'access_token': token,
-            'scope': 'repo,gist',
-            'token_type': 'bearer',
-            'message': None
-        }
-        mock_response.ok = True
+        responses = [
+            (404, {'message': 'No authorization code found for this state'}),
+            (200, {
+                'access_token': token,
+                'scope': 'repo,gist',
+                'token_type': 'bearer',
+                'message': None
+            }),
+        ]
+
+        class GatewayHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                status, d = responses.pop(0)
+                body = json.dumps(d).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
 
         self.app.debug = True
-        response = self.request('POST', '/assemble/auth/token')
+        with serve(GatewayHandler) as url:
+            self.app.oauth_gateway_url = url
+            response = self.request('POST', '/assemble/auth/token')
 
         assert response.ok
         assert self.app.github_token == token
+        assert not responses
 
-    def test_auth_authenticated(self):
-        self.app._is_authenticated = True
+    @patch.object(AssembleApp, '_check_authenticated', return_value=True)
+    def test_auth_authenticated(self, mock_check):
+        self.app.set_github_token('token')
 
         response = self.request('GET', '/assemble/auth/authenticated')
         d = response.json()
 
         assert 'result' in d and d['result']
 
+    def test_auth_authenticated_query_arguments(self):
+        with patch.object(AssembleApp, 'is_authenticated', return_value=True) as mock_check:
+            for value, refresh in [('0', False), ('false', False), ('1', True), ('True', True)]:
+                response = self.request('GET', f'/assemble/auth/authenticated?refresh={value}')
+                assert response.json()['result']
+                mock_check.assert_called_with(refresh=refresh)
+
+        for query in ['wait=soon', 'refresh=maybe']:
+            response = self.request('GET', f'/assemble/auth/authenticated?{query}')
+            assert response.status_code == http.HTTPStatus.BAD_REQUEST
+
+    def test_auth_authenticated_wait_times_out(self):
+        self.app.github_token = ''
+
+        start = time.monotonic()
+        response = self.request('GET', '/assemble/auth/authenticated?wait=0.5')
+        d = response.json()
+
+        assert not d['result']
+        assert time.monotonic() - start >= 0.5
+
+    @patch.object(AssembleApp, '_check_authenticated', return_value=True)
+    def test_auth_authenticated_wait_for_token(self, mock_check):
+        self.app.github_token = ''
+
+        def authenticate():
+            time.sleep(0.5)
+            self.app.set_github_token('token')
+
+        thread = threading.Thread(target=authenticate)
+        start = time.monotonic()
+        thread.start()
+        response = self.request('GET', '/assemble/auth/authenticated?wait=30')
+        thread.join()
+        d = response.json()
+
+        assert d['result']
+        assert time.monotonic() - start < 30
+
+    def submit_and_wait(self, code_content):
+        response = self.request('POST', '/assemble/submit', json={
+            'codeContent': code_content,
+        })
+        assert response.status_code == http.HTTPStatus.ACCEPTED
+        job_id = response.json()['id']
+
+        for _ in range(100):
+            d = self.request('GET', f'/assemble/submit/{job_id}').json()
+            if d['status'] == 'done':
+                return d
+            time.sleep(0.1)
+        raise AssertionError('Submission did not finish')
+
     @patch('ballet_assemble.app.AssembleApp.create_pull_request_for_code_content')
     def test_submit(self, mock_create):
         url = 'url'
@@ -110,18 +644,83 @@ class AssembleHandlersTest(BaseTestCase):
         mock_result = ballet_assemble.app.Response(result=result, url=url)
         mock_create.return_value = asdict(mock_result)
 
-        response = self.request('POST', '/assemble/submit', json={
-            'codeContent': 'code',
-        })
-        d = response.json()
+        d = self.submit_and_wait('code')['response']
 
         assert d['result'] == result and d['url'] == url
 
     def test_submit_empty_cell(self):
-        response = self.request('POST', '/assemble/submit', json={
-            'codeContent': '',
-        })
-        d = response.json()
+        job = self.submit_and_wait('')
+        d = job['response']
 
         assert d['result'] == False
         assert d['message'] is not None
+        assert 'check_code_is_valid' in job['timings']
+
+    @patch('ballet_assemble.app.AssembleApp.create_pull_requests_for_code_contents')
+    def test_submit_batch(self, mock_create):
+        mock_result = ballet_assemble.app.BatchResponse(
+            result=True,
+            responses=[ballet_assemble.app.Response(result=True, url='url')] * 2)
+        mock_create.return_value = asdict(mock_result)
+
+        response = self.request('POST', '/assemble/submit/batch', json={
+            'codeContents': ['x = 1', 'y = 2'],
+        })
+        assert response.status_code == http.HTTPStatus.ACCEPTED
+        job_id = response.json()['id']
+
+        for _ in range(100):
+            d = self.request('GET', f'/assemble/submit/{job_id}').json()
+            if d['status'] == 'done':
+                break
+            time.sleep(0.1)
+
+        assert d['response']['result']
+        assert len(d['response']['responses']) == 2
+
+    def test_slice(self):
+        notebook = nbformat.v4.new_notebook(cells=[
+            nbformat.v4.new_code_cell('import math\nunused = 0'),
+            nbformat.v4.new_code_cell('x = math.pi'),
+        ])
+        nbformat.write(notebook, os.path.join(self.notebook_dir, 'slice.ipynb'))
+
+        response = self.request('POST', '/assemble/slice', json={
+            'path': 'slice.ipynb',
+            'cellIndex': 1,
+        })
+        assert response.ok
+        assert response.json()['codeContent'] == 'import math\nx = math.pi'
+
+        response = self.request('POST', '/assemble/slice', json={
+            'path': 'slice.ipynb',
+            'cellIndex': 5,
+        })
+        assert response.status_code == http.HTTPStatus.NOT_FOUND
+
+        response = self.request('POST', '/assemble/slice', json={
+            'path': 'doesnotexist.ipynb',
+            'cellIndex': 0,
+        })
+        assert response.status_code == http.HTTPStatus.NOT_FOUND
+
+    def test_slice_index_updated_on_save(self):
+        notebook = nbformat.v4.new_notebook(cells=[
+            nbformat.v4.new_code_cell('saved = 1'),
+        ])
+
+        response = self.request('PUT', '/api/contents/saved.ipynb', json={
+            'type': 'notebook',
+            'format': 'json',
+            'content': notebook,
+        })
+        assert response.ok
+        with patch('ballet_assemble.slicing.analyze_cell') as mock_analyze:
+            code_content = self.app.slice_index.slice('saved.ipynb', notebook, cell_index=0)
+        assert code_content == 'saved = 1'
+        mock_analyze.assert_not_called()
+
+    def test_submit_status_not_found(self):
+        response = self.request('GET', '/assemble/submit/doesnotexist')
+
+        assert response.status_code == http.HTTPStatus.NOT_FOUND
@@ -0,0 +1,103 @@
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from ballet_assemble.cache import ExpiringCache, LRUCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_expiring_cache_expires(clock):
+    cache = ExpiringCache(10, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=20)
+
+    clock.now = 9
+    assert cache.get('a') == 1
+
+    clock.now = 10
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+
+    clock.now = 20
+    assert cache.get('b', 'default') == 'default'
+
+
+def test_expiring_cache_get_or_set(clock):
+    cache = ExpiringCache(10, clock=clock)
+    func = Mock(return_value='value')
+
+    assert cache.get_or_set('key', func) == 'value'
+    assert cache.get_or_set('key', func) == 'value'
+    func.assert_called_once()
+
+    clock.now = 10
+    cache.get_or_set('key', func)
+    assert func.call_count == 2
+
+
+def test_expiring_cache_get_or_set_does_not_block_other_keys(clock):
+    cache = ExpiringCache(10, clock=clock)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append('slow')
+        started.set()
+        release.wait(5)
+        return 'slow'
+
+    threads = [threading.Thread(target=cache.get_or_set, args=('slow', slow)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+
+    # other keys are served while func runs for the slow one
+    other = threading.Thread(target=cache.get_or_set, args=('fast', lambda: 'fast'))
+    other.start()
+    other.join(1)
+    assert not other.is_alive()
+    assert cache.get('fast') == 'fast'
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == ['slow']
+    assert cache.get('slow') == 'slow'
+
+
+def test_expiring_cache_does_not_cache_errors(clock):
+    cache = ExpiringCache(10, clock=clock)
+    func = Mock(side_effect=[ValueError, 'value'])
+
+    with pytest.raises(ValueError):
+        cache.get_or_set('key', func)
+    assert cache.get_or_set('key', func) == 'value'
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
@@ -0,0 +1,87 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from ballet_assemble.formatting import CodeFormatter, check_and_format
+
+
+def sleep_forever(code):
+    time.sleep(60)
+
+
+def sleep_if_slow(code):
+    if code == 'slow':
+        time.sleep(60)
+    return True, code
+
+
+def test_check_and_format():
+    assert check_and_format('x=1') == (True, 'x = 1\n')
+    assert check_and_format('x=') == (False, None)
+
+
+def test_formatter_caches_results():
+    func = Mock(wraps=check_and_format)
+    formatter = CodeFormatter(max_workers=0, timeout=1, cache_size=2, func=func)
+
+    assert formatter.is_valid('x=1')
+    assert formatter.blacken('x=1') == 'x = 1\n'
+    assert not formatter.is_valid('x=')
+    with pytest.raises(ValueError):
+        formatter.blacken('x=')
+    assert func.call_count == 2
+
+
+def test_formatter_in_worker_process():
+    formatter = CodeFormatter(max_workers=1, timeout=60, cache_size=2)
+    try:
+        assert formatter.blacken('x=1') == 'x = 1\n'
+    finally:
+        formatter.shutdown()
+
+
+def test_formatter_timeout():
+    formatter = CodeFormatter(max_workers=1, timeout=0.5, cache_size=2, func=sleep_forever)
+    try:
+        with pytest.raises(TimeoutError):
+            formatter.is_valid('x=1')
+        # the stuck worker was replaced
+        formatter.func = check_and_format
+        formatter.timeout = 60
+        assert formatter.is_valid('x=1')
+    finally:
+        formatter.shutdown()
+
+
+def test_formatter_timeout_excludes_worker_startup():
+    # the worker takes longer than the timeout to start and import ballet
+    formatter = CodeFormatter(max_workers=1, timeout=0.5, cache_size=2, func=sleep_if_slow)
+    try:
+        assert formatter.blacken('x=1') == 'x=1'
+    finally:
+        formatter.shutdown()
+
+
+def test_formatter_timeout_does_not_fail_waiting_calls():
+    formatter = CodeFormatter(max_workers=1, timeout=2, cache_size=2, func=sleep_if_slow)
+    try:
+        formatter.is_valid('warm')
+        errors = []
+
+        def run_slow():
+            try:
+                formatter.is_valid('slow')
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run_slow)
+        thread.start()
+        time.sleep(0.5)
+        # waits for the only worker, which is replaced after the timeout
+        assert formatter.blacken('fast') == 'fast'
+        thread.join()
+        assert [type(e) for e in errors] == [TimeoutError]
+    finally:
+        formatter.shutdown()
@@ -0,0 +1,168 @@
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+
+import pytest
+import requests
+from github import Github
+from urllib3.util.retry import Retry
+
+from ballet_assemble.cache import LRUCache
+from ballet_assemble.http_cache import configure_connection
+
+ETAG = '"abc123"'
+
+
+class UserHandler(BaseHTTPRequestHandler):
+
+    statuses = []
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == ETAG:
+            self.statuses.append(304)
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.send_header('X-RateLimit-Limit', '5000')
+            self.send_header('X-RateLimit-Remaining', '4999')
+            self.end_headers()
+            return
+
+        body = json.dumps({'login': 'username'}).encode()
+        self.statuses.append(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', ETAG)
+        self.send_header('X-RateLimit-Limit', '5000')
+        self.send_header('X-RateLimit-Remaining', '5000')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    UserHandler.statuses = []
+    server = HTTPServer(('127.0.0.1', 0), UserHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_conditional_requests(server):
+    base_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    store = LRUCache(10)
+    github = configure_connection(Github('token', base_url=base_url), store=store)
+
+    assert github.get_user().login == 'username'
+    assert github.get_user().login == 'username'
+
+    assert UserHandler.statuses == [200, 304]
+    assert len(store) == 1
+    assert github.rate_limiting[0] == 4999
+
+    # different credentials do not share cached responses
+    other = configure_connection(Github('other', base_url=base_url), store=store)
+    assert other.get_user().login == 'username'
+    assert UserHandler.statuses == [200, 304, 200]
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+
+    failures = 0
+
+    def do_GET(self):
+        if FlakyHandler.failures:
+            FlakyHandler.failures -= 1
+            self.send_response(502)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps({'login': 'username'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_shared_session_keeps_retry_policy():
+    FlakyHandler.failures = 2
+    server = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        base_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+        session = requests.Session()
+        retry = Retry(total=3, status_forcelist=[502], backoff_factor=0)
+        github = configure_connection(
+            Github('token', base_url=base_url, retry=retry), session=session)
+
+        assert github.get_user().login == 'username'
+        assert FlakyHandler.failures == 0
+        # other hosts keep the session's own adapters
+        assert session.get_adapter('http://example.com/').max_retries.total == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class RepoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        # answer slowly enough for concurrent requests to interleave
+        time.sleep(0.001)
+        _, _, owner, name = self.path.split('/')
+        body = json.dumps({
+            'name': name, 'full_name': f'{owner}/{name}', 'owner': {'login': owner},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', f'"{name}"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.parametrize('cached', [True, False])
+def test_shared_client_in_threads(cached):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RepoHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        base_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+        store = LRUCache(100) if cached else None
+        github = configure_connection(Github('token', base_url=base_url), store=store)
+
+        def get_repo(i):
+            name = f'r{i % 20}'
+            return name, github.get_repo(f'owner/{name}').full_name
+
+        # switch threads often, so that requests interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(get_repo, range(400)))
+        finally:
+            sys.setswitchinterval(interval)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [full_name for _, full_name in results] == [f'owner/{name}' for name, _ in results]
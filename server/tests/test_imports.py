@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    'ballet', 'black', 'cookiecutter', 'git', 'github', 'jupyterlab', 'requests', 'sklearn',
+]
+
+
+def test_heavy_modules_are_not_imported_at_startup():
+    # as when the extension is loaded, the notebook server is already imported
+    code = '''
+import json
+import sys
+
+import notebook.notebookapp
+
+import ballet_assemble
+from ballet_assemble.app import AssembleApp
+
+app = AssembleApp(github_token='token')
+app.formatter
+app.transport
+print(json.dumps(sorted(sys.modules)))
+'''
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    modules = json.loads(result.stdout)
+    assert [m for m in modules if m.split('.')[0] in HEAVY_MODULES] == []
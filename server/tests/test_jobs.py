@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from ballet_assemble.jobs import DONE, BoundedExecutor, JobRegistry, QueueFullError, track_stage
+
+
+def test_job_records_stages():
+    registry = JobRegistry(max_finished=10)
+    job = registry.create()
+
+    def func(x):
+        with track_stage('first'):
+            assert registry.get(job.id).stage == 'first'
+        with track_stage('second'):
+            pass
+        return {'result': x}
+
+    response = registry.run(job, func, True)
+
+    assert response == {'result': True}
+    assert job.status == DONE
+    assert job.stage is None
+    assert list(job.timings) == ['first', 'second']
+    assert job.to_dict()['response'] == response
+
+
+def test_track_stage_accumulates_and_nests():
+    registry = JobRegistry(max_finished=10)
+    job = registry.create()
+
+    def func():
+        with track_stage('outer'):
+            for _ in range(2):
+                with track_stage('inner'):
+                    time.sleep(0.05)
+            assert job.stage == 'outer'
+        assert job.stage is None
+        return {}
+
+    registry.run(job, func)
+
+    assert job.timings['inner'] >= 0.1
+    assert job.timings['outer'] >= job.timings['inner']
+
+
+def test_track_stage_without_job():
+    with track_stage('stage'):
+        pass
+
+
+def test_registry_retains_bounded_finished_jobs():
+    registry = JobRegistry(max_finished=2)
+    jobs = [registry.create() for _ in range(4)]
+    pending = jobs.pop()
+    for job in jobs:
+        registry.run(job, dict)
+
+    assert registry.get(jobs[0].id) is None
+    assert registry.get(jobs[1].id) is jobs[1]
+    assert registry.get(jobs[2].id) is jobs[2]
+    assert registry.get(pending.id) is pending
+
+
+def test_bounded_executor_rejects_when_full():
+    executor = BoundedExecutor(max_workers=1, max_queued=1)
+    release = threading.Event()
+    try:
+        running = executor.submit(release.wait)
+        queued = executor.submit(release.wait)
+        with pytest.raises(QueueFullError):
+            executor.submit(release.wait)
+
+        release.set()
+        running.result(timeout=5)
+        queued.result(timeout=5)
+
+        # slots are released as tasks finish
+        executor.submit(release.wait).result(timeout=5)
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,51 @@
+import pytest
+
+from ballet_assemble.metrics import STAGE_DURATION, STAGE_ERRORS, MetricsRegistry
+
+
+def test_counter_and_histogram():
+    registry = MetricsRegistry()
+    counter = registry.counter('requests_total', 'Requests', ('path',))
+    histogram = registry.histogram('latency_seconds', 'Latency', ('path',), buckets=(0.1, 1))
+
+    counter.inc(path='/a')
+    counter.inc(2, path='/a"b')
+    histogram.observe(0.05, path='/a')
+    histogram.observe(0.5, path='/a')
+    histogram.observe(5, path='/a')
+
+    assert registry.counter('requests_total', 'Requests', ('path',)) is counter
+    assert registry.render() == (
+        '# HELP requests_total Requests\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{path="/a"} 1\n'
+        'requests_total{path="/a\\"b"} 2\n'
+        '# HELP latency_seconds Latency\n'
+        '# TYPE latency_seconds histogram\n'
+        'latency_seconds_bucket{path="/a",le="0.1"} 1\n'
+        'latency_seconds_bucket{path="/a",le="1"} 2\n'
+        'latency_seconds_bucket{path="/a",le="+Inf"} 3\n'
+        'latency_seconds_sum{path="/a"} 5.55\n'
+        'latency_seconds_count{path="/a"} 3\n'
+    )
+
+    with pytest.raises(ValueError):
+        counter.inc(other='x')
+    with pytest.raises(ValueError):
+        registry.histogram('requests_total', 'Requests')
+
+
+def test_time_stage():
+    registry = MetricsRegistry()
+
+    with registry.time_stage('clone_repo'):
+        pass
+    with pytest.raises(KeyError):
+        with registry.time_stage('clone_repo'):
+            raise KeyError
+
+    duration = registry.histogram(STAGE_DURATION, '', ('stage', 'outcome'))
+    assert duration.count(stage='clone_repo', outcome='success') == 1
+    assert duration.count(stage='clone_repo', outcome='error') == 1
+    errors = registry.counter(STAGE_ERRORS, '', ('stage', 'error'))
+    assert errors.get(stage='clone_repo', error='KeyError') == 1
@@ -0,0 +1,78 @@
+import os
+
+import git
+import pytest
+
+from ballet_assemble.mirror import RepoMirror, evict_mirrors, list_mirrors
+
+
+def make_commit(repo, name):
+    path = os.path.join(repo.working_tree_dir, name)
+    with open(path, 'w') as f:
+        f.write(name)
+    repo.index.add([name])
+    repo.index.commit(f'Add {name}')
+
+
+@pytest.fixture
+def remote(tmp_path):
+    repo = git.Repo.init(str(tmp_path / 'remote'))
+    with repo.config_writer() as writer:
+        writer.set_value('user', 'name', 'Foo Bar')
+        writer.set_value('user', 'email', 'foo@bar.com')
+    make_commit(repo, 'a.txt')
+    return repo
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    return RepoMirror(tmp_path / 'mirrors' / 'username' / 'reponame.git')
+
+
+def test_mirror_clone(remote, mirror, tmp_path):
+    url = remote.working_tree_dir
+
+    repo = mirror.clone(url, str(tmp_path / 'clone1'))
+    assert repo.head.commit == remote.head.commit
+    assert mirror.path.is_dir()
+    assert url not in git.Repo(str(mirror.path)).remote().url
+
+    # second clone picks up new commits via fetch
+    make_commit(remote, 'b.txt')
+    repo = mirror.clone(url, str(tmp_path / 'clone2'))
+    assert repo.head.commit == remote.head.commit
+
+
+def test_mirror_recovers_from_corruption(remote, mirror, tmp_path):
+    url = remote.working_tree_dir
+    mirror.clone(url, str(tmp_path / 'clone1'))
+
+    mirror.path.joinpath('HEAD').unlink()
+
+    repo = mirror.clone(url, str(tmp_path / 'clone2'))
+    assert repo.head.commit == remote.head.commit
+
+
+def test_mirror_keeps_mirror_when_fetch_fails(remote, mirror, tmp_path):
+    url = remote.working_tree_dir
+    mirror.clone(url, str(tmp_path / 'clone1'))
+    head = git.Repo(str(mirror.path)).head.commit
+
+    with pytest.raises(git.GitCommandError):
+        mirror.update(str(tmp_path / 'doesnotexist'))
+
+    assert git.Repo(str(mirror.path)).head.commit == head
+
+
+def test_evict_mirrors(remote, tmp_path):
+    url = remote.working_tree_dir
+    root = tmp_path / 'mirrors'
+    mirrors = [RepoMirror(root / 'username' / f'repo{i}.git') for i in range(3)]
+    for i, mirror in enumerate(mirrors):
+        mirror.update(url)
+        os.utime(str(mirror.path), (i, i))
+
+    evicted = evict_mirrors(root, 2)
+
+    assert [m.path for m in evicted] == [mirrors[0].path]
+    assert {m.path for m in list_mirrors(root)} == {m.path for m in mirrors[1:]}
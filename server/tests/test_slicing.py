@@ -0,0 +1,180 @@
+import threading
+import time
+from textwrap import dedent
+from unittest.mock import patch
+
+import nbformat
+import pytest
+
+from ballet_assemble.slicing import (
+    SliceIndex, analyze_cell, find_code_cell, slice_cells, slice_notebook)
+
+
+def test_analyze_cell():
+    source = dedent('''\
+        %matplotlib inline
+        import pandas as pd
+        df = pd.read_csv(path)
+        df['x'] += 1
+
+        @decorate
+        def f(a, b=c):
+            d = a + b
+            return [e for e in d if e > g]
+        ''')
+
+    imports, assign, mutate, func = analyze_cell(source)
+
+    assert imports.defs == imports.kills == {'pd'}
+    assert assign.defs == assign.kills == {'df'}
+    assert assign.uses == {'pd', 'path'}
+    assert mutate.defs == {'df'} and not mutate.kills
+    assert 'df' in mutate.uses
+    assert func.source.startswith('@decorate')
+    assert func.source.endswith('return [e for e in d if e > g]')
+    assert func.defs == {'f'}
+    assert func.uses == {'decorate', 'c', 'g'}
+
+
+def test_analyze_cell_invalid():
+    statement, = analyze_cell('if x:\n    %time f()\nx = (')
+    assert statement.opaque
+    assert statement.source == 'if x:\n    %time f()\nx = ('
+    assert analyze_cell('') == []
+
+
+def test_analyze_cell_statements_on_one_line():
+    first, second = analyze_cell('x = 1; y = x\nz = y')
+    assert first.source == 'x = 1; y = x'
+    assert first.defs == first.kills == {'x', 'y'}
+    assert not first.uses
+
+
+def test_slice_cells_with_statements_on_one_line():
+    cells = [analyze_cell('x = 1; y = 2'), analyze_cell('z = x + y')]
+    assert slice_cells(cells, 1) == 'x = 1; y = 2\nz = x + y'
+
+
+def test_slice_cells_includes_unparseable_cells():
+    cells = [analyze_cell('a = 1'), analyze_cell('df?\nb = 2'), analyze_cell('c = b')]
+    assert slice_cells(cells, 2) == 'df?\nb = 2\nc = b'
+
+
+@pytest.mark.parametrize('index,expected', [
+    (2, 'a = 1\nb = a + 1\nc = b * 2'),
+    (3, 'a = 3\nd = a'),
+    (4, 'a = 1\nb = a + 1\nb.append(0)\nprint(b)'),
+])
+def test_slice_cells(index, expected):
+    cells = [
+        analyze_cell('a = 1\nunused = 0'),
+        analyze_cell('b = a + 1'),
+        analyze_cell('c = b * 2'),
+        analyze_cell('a = 3\nd = a'),
+        analyze_cell('b.append(0)\nprint(b)'),
+    ]
+    assert slice_cells(cells, index) == expected
+
+
+def test_slice_cells_with_method_calls_in_earlier_cells():
+    cells = [
+        analyze_cell('df = load()\nlst = []\nd = {}'),
+        analyze_cell('df.fillna(0, inplace=True)\nlst.append(1)\nd.update(a=1)'),
+        analyze_cell('unrelated.append(1)'),
+        analyze_cell('result = f(df, lst, d)'),
+    ]
+    assert slice_cells(cells, 3) == (
+        'df = load()\nlst = []\nd = {}\n'
+        'df.fillna(0, inplace=True)\nlst.append(1)\nd.update(a=1)\n'
+        'result = f(df, lst, d)')
+
+
+def test_slice_notebook():
+    notebook = nbformat.v4.new_notebook(cells=[
+        nbformat.v4.new_code_cell('x = 1\ny = 2'),
+        nbformat.v4.new_markdown_cell('# heading'),
+        nbformat.v4.new_code_cell('z = x + 1'),
+    ])
+    cell_id = notebook.cells[2].get('id')
+
+    assert find_code_cell(notebook, cell_index=1) is None
+    assert find_code_cell(notebook, cell_index=2) == 1
+    assert slice_notebook(notebook, cell_index=2) == 'x = 1\nz = x + 1'
+    if cell_id is not None:
+        assert slice_notebook(notebook, cell_id=cell_id) == 'x = 1\nz = x + 1'
+    with pytest.raises(LookupError):
+        slice_notebook(notebook, cell_id='doesnotexist')
+
+
+def test_slice_index_is_incremental(tmp_path):
+    path = tmp_path / 'index.json'
+    index = SliceIndex(path)
+    notebook = nbformat.v4.new_notebook(cells=[
+        nbformat.v4.new_code_cell('x = 1'),
+        nbformat.v4.new_code_cell('y = x + 1'),
+    ])
+
+    with patch('ballet_assemble.slicing.analyze_cell', wraps=analyze_cell) as mock_analyze:
+        assert index.slice('nb.ipynb', notebook, cell_index=1) == 'x = 1\ny = x + 1'
+        assert mock_analyze.call_count == 2
+
+        notebook.cells.append(nbformat.v4.new_code_cell('z = y'))
+        assert index.slice('nb.ipynb', notebook, cell_index=2) == 'x = 1\ny = x + 1\nz = y'
+        assert mock_analyze.call_count == 3
+
+        # a new index is loaded from disk and does not analyze any cells
+        index.flush()
+        index = SliceIndex(path)
+        assert index.slice('nb.ipynb', notebook, cell_index=2) == 'x = 1\ny = x + 1\nz = y'
+        assert mock_analyze.call_count == 3
+
+    # cells of forgotten notebooks are pruned
+    index = SliceIndex(path, max_notebooks=1)
+    index.update('other.ipynb', nbformat.v4.new_notebook())
+    assert len(index) == 0
+
+
+def test_slice_index_saves_in_background(tmp_path):
+    path = tmp_path / 'index.json'
+    index = SliceIndex(path, save_delay=0.2)
+    notebook = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell('x = 1')])
+
+    with patch.object(SliceIndex, '_save', wraps=index._save) as mock_save:
+        for i in range(5):
+            notebook.cells.append(nbformat.v4.new_code_cell(f'y = {i}'))
+            index.update('nb.ipynb', notebook)
+        assert not path.exists()
+        # the pending write does not hold up exiting
+        assert index._save_timer.daemon
+
+        time.sleep(1)
+        # the burst of updates is written once
+        assert mock_save.call_count == 1
+    assert len(SliceIndex(path)) == 6
+
+
+def test_slice_index_parses_outside_lock():
+    index = SliceIndex()
+    other = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell('x = 1')])
+    index.update('other.ipynb', other)
+    notebook = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell('y = 2')])
+    started, release = threading.Event(), threading.Event()
+
+    def slow_analyze_cell(source):
+        started.set()
+        release.wait(5)
+        return analyze_cell(source)
+
+    with patch('ballet_assemble.slicing.analyze_cell', side_effect=slow_analyze_cell):
+        updater = threading.Thread(target=index.update, args=('nb.ipynb', notebook))
+        updater.start()
+        started.wait(5)
+        slicer = threading.Thread(target=index.slice, args=('other.ipynb', other),
+                                  kwargs={'cell_index': 0})
+        slicer.start()
+        slicer.join(1)
+        # slicing a notebook that is already indexed does not wait for parsing
+        assert not slicer.is_alive()
+        release.set()
+        updater.join()
+    assert index.slice('nb.ipynb', notebook, cell_index=0) == 'y = 2'
@@ -0,0 +1,42 @@
+from ballet_assemble.submissions import SubmissionLog, hash_submission
+
+
+def test_hash_submission():
+    code = 'x = 1\n'
+    assert hash_submission('owner/repo', [code]) == hash_submission('owner/repo', [code])
+    assert hash_submission('owner/repo', [code]) != hash_submission('owner/other', [code])
+    assert hash_submission('owner/repo', ['a', 'b']) != hash_submission('owner/repo', ['ab'])
+
+
+def test_submission_log_expires(tmp_path):
+    now = [0]
+    log = SubmissionLog(tmp_path / 'user.json', max_age=10, clock=lambda: now[0])
+
+    log.add('key', 'url')
+    assert log.get('key') == 'url'
+    assert log.get('other') is None
+
+    now[0] = 10
+    assert log.get('key') is None
+
+    log.add('other', 'url2')
+    log = SubmissionLog(tmp_path / 'user.json', max_age=10, clock=lambda: now[0])
+    assert log.get('other') == 'url2'
+    assert 'key' not in log._load()
+
+
+def test_submission_log_reserve(tmp_path):
+    log = SubmissionLog(tmp_path / 'user.json', max_age=10)
+
+    assert log.reserve('key') is None
+    pending = log.reserve('key')
+    assert not pending.done()
+    log.release('key', 'url')
+    assert pending.result() == 'url'
+
+    # a failed submission passes the reservation on
+    assert log.reserve('key') is None
+    pending = log.reserve('key')
+    log.release('key', None)
+    assert pending.result() is None
+    assert log.reserve('key') is None
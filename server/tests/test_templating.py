@@ -0,0 +1,50 @@
+import json
+import pathlib
+
+import pytest
+from ballet.templating import FEATURE_TEMPLATE_PATH, cookiecutter
+
+from ballet_assemble.templating import FeatureTemplate
+
+
+def render_with_cookiecutter(output_dir, template_path=FEATURE_TEMPLATE_PATH, **extra_context):
+    rendered_dir = pathlib.Path(cookiecutter(
+        template_path, output_dir=output_dir, no_input=True, extra_context=extra_context))
+    return {
+        path.relative_to(rendered_dir).as_posix(): path.read_bytes()
+        for path in rendered_dir.rglob('*')
+        if path.is_file() and path.suffix != '.pyc'
+    }
+
+
+@pytest.mark.parametrize('extra_context', [
+    {'username': 'some_user', 'featurename': 'abc_123'},
+    {'featurename': 'abc_123'},
+    {},
+])
+def test_feature_template_matches_cookiecutter(tmp_path, extra_context):
+    expected = render_with_cookiecutter(tmp_path, **extra_context)
+    files = FeatureTemplate().render(**extra_context)
+    assert {path: content.encode('utf-8') for path, content in files.items()} == expected
+
+
+def test_feature_template_with_variables_and_line_endings(tmp_path):
+    template_path = tmp_path / 'template'
+    project_dir = template_path / '{{ cookiecutter._dir }}'
+    project_dir.joinpath('{{ cookiecutter.username }}').mkdir(parents=True)
+    template_path.joinpath('cookiecutter.json').write_text(json.dumps({
+        'username': 'user',
+        'fullname': '{{ cookiecutter.username|upper }}',
+        'kind': ['first', 'second'],
+        '_dir': 'output',
+    }))
+    project_dir.joinpath('{{ cookiecutter.username }}', 'a.txt').write_bytes(
+        b'{{ cookiecutter.fullname }}\r\n{{ cookiecutter.kind }}\r\n')
+    project_dir.joinpath('b.txt').write_bytes(b'{{ cookiecutter._dir }}')
+
+    template = FeatureTemplate(template_path)
+    expected = render_with_cookiecutter(
+        tmp_path / 'out', template_path=template_path, username='someone')
+    files = template.render(username='someone')
+    assert files['someone/a.txt'] == 'SOMEONE\r\nfirst\r\n'
+    assert {path: content.encode('utf-8') for path, content in files.items()} == expected
@@ -0,0 +1,58 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from tornado.ioloop import IOLoop
+
+from ballet_assemble.transport import HTTPTransport
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    peers = set()
+
+    def do_GET(self):
+        self.peers.add(self.client_address)
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    EchoHandler.peers = set()
+    server = HTTPServer(('127.0.0.1', 0), EchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_transport_reuses_connections(base_url):
+    transport = HTTPTransport(pool_size=2, timeout=5, max_clients=2)
+
+    for _ in range(3):
+        response = transport.get(base_url)
+        assert response.text == 'ok'
+
+    # every request was sent over the same kept-alive connection
+    assert len(EchoHandler.peers) == 1
+    transport.close()
+
+
+def test_transport_fetch(base_url):
+    transport = HTTPTransport(pool_size=2, timeout=5, max_clients=2)
+
+    async def fetch():
+        assert transport.async_client is transport.async_client
+        return await transport.fetch(base_url)
+
+    response = IOLoop.current().run_sync(fetch)
+    assert response.body == b'ok'
+    transport.close()
@@ -13,12 +13,29 @@ export interface ISubmissionResponse {
   tb?: string;
 }
 
+export interface IBatchSubmissionResponse {
+  result: boolean;
+  responses: ISubmissionResponse[];
+  message?: string;
+}
+
+export interface ISubmissionJob<R = ISubmissionResponse> {
+  id: string;
+  status: 'pending' | 'running' | 'done';
+  stage?: string;
+  timings: { [stage: string]: number };
+  response?: R;
+}
+
 export interface IAuthenticatedResponse {
   result: boolean;
 }
 
+const SUBMISSION_POLL_INTERVAL = 1000;
+
 export async function submit(
-  cellContents: string
+  cellContents: string,
+  onProgress?: (job: ISubmissionJob) => void
 ): Promise<ISubmissionResponse> {
   const endPoint = 'submit';
   const init = {
@@ -29,19 +46,109 @@ export async function submit(
   };
 
   try {
-    return request<ISubmissionResponse>(endPoint, init);
+    const job = await waitForJob<ISubmissionResponse>(
+      await request<ISubmissionJob>(endPoint, init),
+      onProgress
+    );
+    return job.response || { result: false };
   } catch (error) {
     console.error(error);
-    return { result: false };
+    return { result: false, message: error.message };
   }
 }
 
+/**
+ * Submit several cells at once, sharing a single clone of the project
+ *
+ * @param combined Whether to propose all features in one pull request
+ * rather than one pull request each
+ */
+export async function submitBatch(
+  cellContents: string[],
+  combined = false,
+  onProgress?: (job: ISubmissionJob<IBatchSubmissionResponse>) => void
+): Promise<IBatchSubmissionResponse> {
+  const endPoint = 'submit/batch';
+  const init = {
+    method: 'POST',
+    body: JSON.stringify({
+      codeContents: cellContents,
+      combined
+    })
+  };
+
+  try {
+    const job = await waitForJob<IBatchSubmissionResponse>(
+      await request<ISubmissionJob<IBatchSubmissionResponse>>(endPoint, init),
+      onProgress
+    );
+    return job.response || { result: false, responses: [] };
+  } catch (error) {
+    console.error(error);
+    return { result: false, responses: [], message: error.message };
+  }
+}
+
+async function waitForJob<R>(
+  job: ISubmissionJob<R>,
+  onProgress?: (job: ISubmissionJob<R>) => void
+): Promise<ISubmissionJob<R>> {
+  while (job.status !== 'done') {
+    if (onProgress) {
+      onProgress(job);
+    }
+    await new Promise(resolve =>
+      setTimeout(resolve, SUBMISSION_POLL_INTERVAL)
+    );
+    job = await getSubmissionJob<R>(job.id);
+  }
+  return job;
+}
+
+export interface ISliceResponse {
+  codeContent: string;
+}
+
+/**
+ * Compute the code that a cell depends on, on the server
+ *
+ * @param path Path of the notebook, as saved, relative to the server root
+ * @param cellIndex Position of the cell among all cells of the notebook
+ * @returns The sliced code, ready to submit
+ */
+export async function sliceCell(
+  path: string,
+  cellIndex: number
+): Promise<string> {
+  const init = {
+    method: 'POST',
+    body: JSON.stringify({ path, cellIndex })
+  };
+  const response = await request<ISliceResponse>('slice', init);
+  return response.codeContent;
+}
+
+export async function getSubmissionJob<R = ISubmissionResponse>(
+  id: string
+): Promise<ISubmissionJob<R>> {
+  return request<ISubmissionJob<R>>(`submit/${id}`);
+}
+
 export async function checkStatus(): Promise<void> {
   return request<void>('status');
 }
 
-export async function isAuthenticated(): Promise<boolean> {
-  const response = await request<IAuthenticatedResponse>('auth/authenticated');
+/**
+ * Check whether the user is authenticated with GitHub
+ *
+ * @param wait If not authenticated yet, number of seconds for the server to
+ * wait for the authentication state to change before responding
+ */
+export async function isAuthenticated(wait?: number): Promise<boolean> {
+  const endPoint = wait
+    ? `auth/authenticated?wait=${wait}`
+    : 'auth/authenticated';
+  const response = await request<IAuthenticatedResponse>(endPoint);
   return response.result;
 }
 